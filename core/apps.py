@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (connects receivers)
+        if getattr(settings, 'CRYPTO_SELFTEST', False):
+            from .utils.crypto_selftest import run_crypto_selftest
+            run_crypto_selftest()
@@ -0,0 +1,18 @@
+# Generated for the dues list partial index
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0010_order_type_address_payment_method'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('due_balance__gt', 0), ('is_superuser', False)), fields=['-due_balance'], name='user_due_balance_desc_idx'),
+        ),
+    ]
@@ -75,6 +75,16 @@ class User(AbstractUser):
 
 
     USERNAME_FIELD = 'phone'
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Dues list: vendors with outstanding dues, highest first
+            models.Index(
+                fields=['-due_balance'],
+                name='user_due_balance_desc_idx',
+                condition=models.Q(due_balance__gt=0, is_superuser=False),
+            ),
+        ]
     
     def __str__(self):
         return f'{self.name} - ({self.phone})'
@@ -9,15 +9,13 @@ from datetime import timedelta
 from django.utils import timezone
 from django.conf import settings
 from ..models import OTP
+from .whatsapp_service import build_template_payload, is_msg91_configured, post_msg91
 
 logger = logging.getLogger(__name__)
 
 # OTP expiry time in minutes
 OTP_EXPIRY_MINUTES = 10
 
-# MSG91 WhatsApp API endpoint for OTP
-MSG91_WHATSAPP_API_URL = 'https://api.msg91.com/api/v5/whatsapp/whatsapp-outbound-message/bulk/'
-
 
 def generate_otp_code(length: int = 6) -> str:
     """Generate a random numeric OTP code."""
@@ -69,55 +67,34 @@ def send_otp_whatsapp(phone: str, country_code: str, otp_code: str) -> bool:
     Returns:
         bool: True if message was sent successfully, False otherwise
     """
+    if not is_msg91_configured():
+        return False
     try:
         # Format phone number with country code
         full_phone = f"{country_code}{phone}"
         
         # Build payload for MSG91 API - using text template for OTP
         # Note: You may need to create an OTP template in MSG91 dashboard
-        payload = {
-            "integrated_number": getattr(settings, 'MSG91_WHATSAPP_INTEGRATED_NUMBER', ''),
-            "content_type": "template",
-            "payload": {
-                "messaging_product": "whatsapp",
-                "type": "template",
-                "template": {
-                    "name": getattr(settings, 'MSG91_WHATSAPP_TEMPLATE_OTP_NAME', 'mycafe_otp'),
-                    "language": {
-                        "code": "en",
-                        "policy": "deterministic"
-                    },
-                    "namespace": getattr(settings, 'MSG91_WHATSAPP_TEMPLATE_OTP_NAMESPACE', 
-                                        getattr(settings, 'MSG91_WHATSAPP_TEMPLATE_CUSTOMER_NAMESPACE', '')),
-                    "to_and_components": [
-                        {
-                            "to": [full_phone],
-                            "components": {
-                                "body_1": {
-                                    "type": "text",
-                                    "value": otp_code
-                                }
-                            }
+        payload = build_template_payload(
+            getattr(settings, 'MSG91_WHATSAPP_TEMPLATE_OTP_NAME', 'mycafe_otp'),
+            getattr(settings, 'MSG91_WHATSAPP_TEMPLATE_OTP_NAMESPACE',
+                    getattr(settings, 'MSG91_WHATSAPP_TEMPLATE_CUSTOMER_NAMESPACE', '')),
+            [
+                {
+                    "to": [full_phone],
+                    "components": {
+                        "body_1": {
+                            "type": "text",
+                            "value": otp_code
                         }
-                    ]
+                    }
                 }
-            }
-        }
-        
-        # Set headers
-        headers = {
-            'Content-Type': 'application/json',
-            'authkey': getattr(settings, 'MSG91_AUTH_KEY', '')
-        }
-        
-        # Make API request
-        response = requests.post(
-            MSG91_WHATSAPP_API_URL,
-            json=payload,
-            headers=headers,
-            timeout=30
+            ]
         )
         
+        # Make API request (shared MSG91 session, headers and circuit breaker)
+        response = post_msg91(payload)
+        
         # Log response
         if response.status_code == 200:
             response_data = response.json()
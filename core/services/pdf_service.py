@@ -81,10 +81,12 @@ class BeigeInvoiceCanvas(canvas.Canvas):
         super().showPage()
 
 
-def generate_order_invoice(order):
+def generate_order_invoice(order, items=None):
     """
     Generate a PDF invoice for an order matching the image design.
     Single-page, centered layout: logo, title, FROM/TO, table, summary, terms/payment, olive footer.
+    items: optional order items the caller already loaded (with product and
+    product_variant__unit); when omitted they are queried here.
     Returns the PDF file as a ContentFile.
     """
     buffer = BytesIO()
@@ -289,7 +291,10 @@ def generate_order_invoice(order):
     elements.append(Spacer(1, 0.15 * inch))
 
     # --- Items table: IMAGE, ITEM NAME, QTY, PRICE, DISCOUNT, AMOUNT ---
-    order_items = order.items.select_related('product', 'product_variant__unit').all()
+    if items is not None:
+        order_items = items
+    else:
+        order_items = order.items.select_related('product', 'product_variant__unit').all()
     img_size = 0.55 * inch
     table_data = [['', 'ITEMS', 'QTY.', 'RATE', 'DISCOUNT', 'AMOUNT']]
     for item in order_items:
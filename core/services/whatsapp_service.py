@@ -1,25 +1,232 @@
 """
 WhatsApp service for sending messages via MSG91 API
 """
+import re
 import requests
 import logging
+import threading
+import time
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
 
-from core.models import SuperSetting
+from core.models import Order, WhatsAppNotification
+from core.utils.json_helpers import json_dumps
+from core.utils.settings_cache import get_marketing_config
+from core.utils.transaction_helpers import process_whatsapp_usage
 
 logger = logging.getLogger(__name__)
 
 # MSG91 WhatsApp API endpoint
 MSG91_WHATSAPP_API_URL = 'https://api.msg91.com/api/v5/whatsapp/whatsapp-outbound-message/bulk/'
 
+# (connect, read) timeout for MSG91 requests; 3.05s sits just past the 3s TCP retransmit window
+MSG91_TIMEOUT = (3.05, 10)
+
+# Max recipients per MSG91 bulk request (entries in to_and_components)
+MSG91_BATCH_SIZE = 100
+
+# Max concurrent MSG91 requests per marketing broadcast
+WHATSAPP_MAX_CONCURRENCY = 4
+
+# Order bill / order-ready sends run here instead of one new thread per request;
+# the worker count caps concurrent MSG91 calls (and DB connections) from these sends
+ORDER_WHATSAPP_WORKERS = 4
+_ORDER_WHATSAPP_EXECUTOR = ThreadPoolExecutor(
+    max_workers=ORDER_WHATSAPP_WORKERS, thread_name_prefix='order-whatsapp'
+)
+
+# Min seconds between sent_count progress writes during a broadcast
+PROGRESS_FLUSH_INTERVAL = 2
+
+# Retry transient MSG91 failures (429, connection errors) with jittered exponential backoff.
+# Other responses are returned as-is; the final response is returned rather than raised.
+# Only 429 is retried by status: MSG91 rejected the request without sending it. A 5xx may
+# arrive after the batch was accepted, so it is left to the circuit breaker and the caller.
+# read=0: never retry once the request may have reached MSG91 (read timeout / dropped
+# response). Together with the 429-only status list, the adapter never re-sends a request
+# MSG91 may have accepted, so a delivered message is not billed twice by a retry.
+MSG91_RETRY = Retry(
+    total=3,
+    read=0,
+    backoff_factor=0.5,
+    backoff_jitter=0.5,
+    status_forcelist=(429,),
+    allowed_methods=frozenset(['POST']),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+# Shared HTTP session so MSG91 calls reuse pooled keep-alive connections
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=MSG91_RETRY))
+_SESSION.headers['Content-Type'] = 'application/json'
+
+
+def get_msg91_session() -> requests.Session:
+    """
+    Return the shared MSG91 requests.Session.
+    The authkey header is set on the session and refreshed if MSG91_AUTH_KEY changes.
+    """
+    authkey = getattr(settings, 'MSG91_AUTH_KEY', '')
+    if _SESSION.headers.get('authkey') != authkey:
+        _SESSION.headers['authkey'] = authkey
+    return _SESSION
+
+
+# Static parts of every MSG91 template payload
+MSG91_WHATSAPP_INTEGRATED_NUMBER = getattr(settings, 'MSG91_WHATSAPP_INTEGRATED_NUMBER', '')
+_TEMPLATE_LANGUAGE = {'code': 'en', 'policy': 'deterministic'}
+
+
+def build_template_payload(template_name: str, template_namespace: str, to_and_components: list) -> dict:
+    """
+    Build an MSG91 WhatsApp template payload.
+    Only the template name, namespace and recipients vary between calls.
+    """
+    return {
+        'integrated_number': MSG91_WHATSAPP_INTEGRATED_NUMBER,
+        'content_type': 'template',
+        'payload': {
+            'messaging_product': 'whatsapp',
+            'type': 'template',
+            'template': {
+                'name': template_name,
+                'language': _TEMPLATE_LANGUAGE,
+                'namespace': template_namespace,
+                'to_and_components': to_and_components,
+            },
+        },
+    }
+
+
+_missing_config_logged = False
+
+
+def is_msg91_configured() -> bool:
+    """
+    Return True if MSG91 auth key and integrated number are set.
+    Senders check this first so a misconfigured env fails fast instead of
+    spending a round trip per message on a guaranteed 401. Logs once.
+    """
+    global _missing_config_logged
+    if getattr(settings, 'MSG91_AUTH_KEY', '') and MSG91_WHATSAPP_INTEGRATED_NUMBER:
+        return True
+    if not _missing_config_logged:
+        logger.error('MSG91_AUTH_KEY / MSG91_WHATSAPP_INTEGRATED_NUMBER not configured; WhatsApp sends are disabled')
+        _missing_config_logged = True
+    return False
+
+
+def dumps_payload(payload: dict) -> bytes:
+    """Serialize an MSG91 payload to JSON bytes for the request body."""
+    return json_dumps(payload)
+
+
+class MSG91Unavailable(requests.exceptions.RequestException):
+    """Raised instead of calling MSG91 while the circuit breaker is open."""
+
+
+class _CircuitBreaker:
+    """
+    Minimal thread-safe circuit breaker.
+    Opens after fail_max consecutive failures; after reset_timeout seconds a single
+    probe call is let through, and its outcome closes or re-opens the circuit.
+    """
 
+    def __init__(self, fail_max: int, reset_timeout: float):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info('MSG91 circuit closed after successful probe')
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.fail_max):
+                if self._opened_at is None:
+                    logger.error(
+                        f'MSG91 circuit opened after {self._failures} consecutive failures; '
+                        f'pausing sends for {self.reset_timeout}s'
+                    )
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+_MSG91_BREAKER = _CircuitBreaker(fail_max=5, reset_timeout=30)
+
+
+def post_msg91(payload: dict) -> requests.Response:
+    """
+    POST a template payload to MSG91 through the shared session and circuit breaker.
+    Raises MSG91Unavailable without a network call while the circuit is open.
+    Connection errors, timeouts, any other exception from the session and 429/5xx
+    responses count as failures.
+    """
+    # Serialize before taking a breaker slot: a bad payload is the caller's error, not MSG91's
+    body = dumps_payload(payload)
+    if not _MSG91_BREAKER.allow():
+        raise MSG91Unavailable('MSG91 circuit open; skipping send')
+    try:
+        response = get_msg91_session().post(
+            MSG91_WHATSAPP_API_URL,
+            data=body,
+            timeout=MSG91_TIMEOUT,
+        )
+    except BaseException:
+        # Any exception must settle the breaker, or a half-open probe would stay taken forever
+        _MSG91_BREAKER.record_failure()
+        raise
+    if response.status_code == 429 or response.status_code >= 500:
+        _MSG91_BREAKER.record_failure()
+    else:
+        _MSG91_BREAKER.record_success()
+    return response
+
+
+# Matches every non-digit character; compiled once for phone normalization
+_NON_DIGIT = re.compile(r'[^0-9]')
+
+# Country code prefixes accepted as-is (after dropping a leading + or 00), and the characters they start with
+_VALID_PREFIXES = ('977', '91')
+_VALID_PREFIX_FIRST_CHARS = frozenset(p[0] for p in _VALID_PREFIXES)
+
+
+@lru_cache(maxsize=4096)
 def format_phone_number(phone: str, country_code: str = None) -> str:
     """
     Format phone number with country code.
     - If country_code is provided, use it directly
-    - If phone already starts with valid prefix (977, 91, +91, +977, 00977, 0091), use as-is
+    - A leading international prefix (+ or 00) is dropped
+    - If phone then starts with a valid country code (977, 91), use as-is
     - Otherwise, add 91 (India) prefix
     
+    Results are cached, since the same vendor/customer numbers recur across sends.
+    
     Args:
         phone: Phone number string
         country_code: Optional country code to prepend (e.g., '91', '977')
@@ -35,18 +242,20 @@ def format_phone_number(phone: str, country_code: str = None) -> str:
     
     # If country_code is explicitly provided, use it
     if country_code:
-        # Remove any special characters from phone, keep only digits
-        phone = ''.join(c for c in phone if c.isdigit())
-        # Ensure country_code is clean (digits only)
-        country_code = ''.join(c for c in country_code if c.isdigit())
-        return country_code + phone
+        # Remove any special characters from phone and country_code, keep only digits
+        return _NON_DIGIT.sub('', country_code) + _NON_DIGIT.sub('', phone)
+    
+    # Drop international prefix (+977 / 00977 -> 977) with a slice instead of another scan
+    if phone.startswith('+'):
+        phone = phone[1:]
+    elif phone.startswith('00'):
+        phone = phone[2:]
     
     # Check if phone already has a valid country code prefix (before removing special chars)
-    valid_prefixes = ('+977', '+91', '00977', '0091', '977', '91')
-    has_country_code = any(phone.startswith(prefix) for prefix in valid_prefixes)
+    has_country_code = phone[:1] in _VALID_PREFIX_FIRST_CHARS and phone.startswith(_VALID_PREFIXES)
     
     # Remove spaces, dashes, parentheses, and plus sign - keep only digits
-    phone = ''.join(c for c in phone if c.isdigit())
+    phone = _NON_DIGIT.sub('', phone)
     
     # If no country code was present, add 91 (India)
     if not has_country_code:
@@ -72,50 +281,25 @@ def _send_whatsapp_message(phone: str, order_id: int, invoice_pdf_url: str,
     Returns:
         bool: True if message was sent successfully, False otherwise
     """
+    if not is_msg91_configured():
+        return False
     try:
         # Build payload according to MSG91 API specification
-        payload = {
-            "integrated_number": getattr(settings, 'MSG91_WHATSAPP_INTEGRATED_NUMBER', ''),
-            "content_type": "template",
-            "payload": {
-                "messaging_product": "whatsapp",
-                "type": "template",
-                "template": {
-                    "name": template_name,
-                    "language": {
-                        "code": "en",
-                        "policy": "deterministic"
-                    },
-                    "namespace": template_namespace,
-                    "to_and_components": [
-                        {
-                            "to": [phone],
-                            "components": {
-                                "header_1": {
-                                    "filename": f'ORDER BILL {str(order_id)}',
-                                    "type": "document",
-                                    "value": invoice_pdf_url
-                                }
-                            }
-                        }
-                    ]
+        payload = build_template_payload(template_name, template_namespace, [
+            {
+                "to": [phone],
+                "components": {
+                    "header_1": {
+                        "filename": f'ORDER BILL {str(order_id)}',
+                        "type": "document",
+                        "value": invoice_pdf_url
+                    }
                 }
             }
-        }
-        
-        # Set headers
-        headers = {
-            'Content-Type': 'application/json',
-            'authkey': getattr(settings, 'MSG91_AUTH_KEY', '')
-        }
+        ])
         
         # Make API request
-        response = requests.post(
-            MSG91_WHATSAPP_API_URL,
-            json=payload,
-            headers=headers,
-            timeout=30
-        )
+        response = post_msg91(payload)
         
         # Log response
         if response.status_code == 200:
@@ -161,6 +345,9 @@ def send_order_bill_whatsapp(order, invoice_pdf_url: str) -> bool:
     Returns:
         bool: True if at least one message was sent successfully, False otherwise
     """
+    if not is_msg91_configured():
+        return False
+    
     # Get and format phone numbers using stored country codes
     customer_country_code = getattr(order, 'country_code', None) or '91'
     customer_phone = format_phone_number(order.phone, customer_country_code)
@@ -213,6 +400,8 @@ def send_order_ready_whatsapp(order) -> bool:
     Returns:
         bool: True if message was sent successfully, False otherwise
     """
+    if not is_msg91_configured():
+        return False
     try:
         customer_country_code = getattr(order, 'country_code', None) or '91'
         customer_phone = format_phone_number(order.phone, customer_country_code)
@@ -231,34 +420,11 @@ def send_order_ready_whatsapp(order) -> bool:
             'body_1': {'type': 'text', 'value': order.name},
         }
 
-        payload = {
-            'integrated_number': getattr(settings, 'MSG91_WHATSAPP_INTEGRATED_NUMBER', ''),
-            'content_type': 'template',
-            'payload': {
-                'messaging_product': 'whatsapp',
-                'type': 'template',
-                'template': {
-                    'name': template_name,
-                    'language': {'code': 'en', 'policy': 'deterministic'},
-                    'namespace': template_namespace,
-                    'to_and_components': [
-                        {'to': [customer_phone], 'components': components}
-                    ],
-                },
-            },
-        }
+        payload = build_template_payload(template_name, template_namespace, [
+            {'to': [customer_phone], 'components': components}
+        ])
 
-        headers = {
-            'Content-Type': 'application/json',
-            'authkey': getattr(settings, 'MSG91_AUTH_KEY', ''),
-        }
-
-        response = requests.post(
-            MSG91_WHATSAPP_API_URL,
-            json=payload,
-            headers=headers,
-            timeout=30,
-        )
+        response = post_msg91(payload)
 
         if response.status_code == 200:
             response_data = response.json()
@@ -285,38 +451,62 @@ def send_order_ready_whatsapp(order) -> bool:
         return False
 
 
-def _get_marketing_template_names():
-    """Get marketing template names from SuperSetting or Django settings fallback."""
+def _run_order_whatsapp(send_func, order_id: int, *args):
+    """Executor worker: load order and run send_func(order, *args)."""
     try:
-        super_setting = SuperSetting.objects.filter(id=1).first()
-        if super_setting:
-            template_marketing = getattr(
-                super_setting, 'whatsapp_template_marketing', None
-            ) or getattr(settings, 'MSG91_WHATSAPP_TEMPLATE_MARKETING', 'mycafemarketing')
-            template_imagemarketing = getattr(
-                super_setting, 'whatsapp_template_imagemarketing', None
-            ) or getattr(settings, 'MSG91_WHATSAPP_TEMPLATE_IMAGE_MARKETING', 'mycafeimagemarketing')
-            return template_marketing, template_imagemarketing
+        order = Order.objects.select_related('user').filter(pk=order_id).first()
+        if order:
+            send_func(order, *args)
     except Exception:
-        pass
-    return (
-        getattr(settings, 'MSG91_WHATSAPP_TEMPLATE_MARKETING', 'mycafemarketing'),
-        getattr(settings, 'MSG91_WHATSAPP_TEMPLATE_IMAGE_MARKETING', 'mycafeimagemarketing'),
+        logger.exception('Background %s failed for order %s', send_func.__name__, order_id)
+    finally:
+        connection.close()
+
+
+def _submit_order_whatsapp(send_func, order_id: int, *args) -> None:
+    """
+    Queue _run_order_whatsapp on the shared executor once the current DB transaction
+    commits (immediately in autocommit), so the worker never reads an uncommitted order.
+    """
+    db_transaction.on_commit(
+        lambda: _ORDER_WHATSAPP_EXECUTOR.submit(_run_order_whatsapp, send_func, order_id, *args)
     )
 
 
-def _send_marketing_whatsapp_single(
-    phone: str,
+def send_order_bill_whatsapp_async(order_id: int, invoice_pdf_url: str) -> None:
+    """
+    Send the order bill WhatsApp in the background so the request returns
+    without waiting on MSG91. The order is re-fetched by id in the worker.
+    """
+    _submit_order_whatsapp(send_order_bill_whatsapp, order_id, invoice_pdf_url)
+
+
+def send_order_ready_whatsapp_async(order_id: int) -> None:
+    """
+    Send the "order ready" WhatsApp in the background so the request returns
+    without waiting on MSG91. The order is re-fetched by id in the worker.
+    """
+    _submit_order_whatsapp(send_order_ready_whatsapp, order_id)
+
+
+def _send_marketing_whatsapp_batch(
+    phones: list,
     message: str,
     image_url: str,
     template_name: str,
     template_namespace: str,
     has_image: bool,
     notification_id: int,
-) -> bool:
+) -> int:
     """
-    Send a single marketing WhatsApp message (text or text+image template).
+    Send one marketing WhatsApp template (text or text+image) to a batch of phones
+    in a single MSG91 bulk request.
+
+    Returns:
+        int: Number of recipients in the batch accepted by MSG91 (0 on failure)
     """
+    if not phones or not is_msg91_configured():
+        return 0
     try:
         components = {}
         if has_image and image_url:
@@ -330,71 +520,50 @@ def _send_marketing_whatsapp_single(
             'value': message or '',
         }
 
-        payload = {
-            'integrated_number': getattr(settings, 'MSG91_WHATSAPP_INTEGRATED_NUMBER', ''),
-            'content_type': 'template',
-            'payload': {
-                'messaging_product': 'whatsapp',
-                'type': 'template',
-                'template': {
-                    'name': template_name,
-                    'language': {'code': 'en', 'policy': 'deterministic'},
-                    'namespace': template_namespace,
-                    'to_and_components': [
-                        {'to': [phone], 'components': components}
-                    ],
-                },
-            },
-        }
-
-        headers = {
-            'Content-Type': 'application/json',
-            'authkey': getattr(settings, 'MSG91_AUTH_KEY', ''),
-        }
+        payload = build_template_payload(template_name, template_namespace, [
+            {'to': [phone], 'components': components} for phone in phones
+        ])
 
-        response = requests.post(
-            MSG91_WHATSAPP_API_URL,
-            json=payload,
-            headers=headers,
-            timeout=30,
-        )
+        response = post_msg91(payload)
 
         if response.status_code == 200:
             response_data = response.json()
             if response_data.get('status') == 'success':
                 logger.info(
-                    f'WhatsApp marketing sent to {phone} for notification #{notification_id}. '
-                    f'Template: {template_name}'
+                    f'WhatsApp marketing batch of {len(phones)} sent for notification #{notification_id}. '
+                    f'Template: {template_name}. Request ID: {response_data.get("request_id")}'
                 )
-                return True
+                return len(phones)
             logger.error(
-                f'MSG91 API error for notification #{notification_id} ({phone}): {response_data}'
+                f'MSG91 API error for notification #{notification_id} '
+                f'(batch of {len(phones)}): {response_data}'
             )
-            return False
+            return 0
         logger.error(
-            f'MSG91 API failed for notification #{notification_id} ({phone}): '
+            f'MSG91 API failed for notification #{notification_id} (batch of {len(phones)}): '
             f'status={response.status_code}, body={response.text}'
         )
-        return False
+        return 0
     except requests.exceptions.Timeout:
-        logger.error(f'MSG91 API timeout for notification #{notification_id} ({phone})')
-        return False
+        logger.error(f'MSG91 API timeout for notification #{notification_id} (batch of {len(phones)})')
+        return 0
     except Exception as e:
-        logger.error(f'Failed to send marketing WhatsApp to {phone}: {e}')
-        return False
+        logger.error(
+            f'Failed to send marketing WhatsApp batch of {len(phones)} '
+            f'for notification #{notification_id}: {e}'
+        )
+        return 0
 
 
 def send_marketing_whatsapp(notification):
     """
     Send marketing WhatsApp to all customers on the notification.
-    Updates notification.sent_count after each send; sets status to 'sent' or 'failed'.
+    Recipients are sent in MSG91 bulk batches of MSG91_BATCH_SIZE, up to
+    WHATSAPP_MAX_CONCURRENCY batches in flight at once.
+    Updates notification.sent_count as batches complete (throttled); sets status to 'sent' or 'failed'.
     On full success, charges vendor via process_whatsapp_usage(sent_count * whatsapp_per_usage).
     """
-    from django.db import transaction as db_transaction
-    from core.models import WhatsAppNotification
-    from core.utils.transaction_helpers import process_whatsapp_usage
-
-    template_marketing, template_imagemarketing = _get_marketing_template_names()
+    template_marketing, template_imagemarketing, is_whatsapp_usage, per_usage = get_marketing_config()
     namespace = getattr(
         settings, 'MSG91_WHATSAPP_TEMPLATE_CUSTOMER_NAMESPACE',
         getattr(settings, 'MSG91_WHATSAPP_TEMPLATE_VENDOR_NAMESPACE', ''),
@@ -413,48 +582,69 @@ def send_marketing_whatsapp(notification):
             logger.warning(f'Could not build image URL for notification #{notification.id}: {e}')
 
     vendor_country_code = getattr(notification.user, 'country_code', None) or '91'
-    customers = list(notification.customers.all())
-    total = len(customers)
+    total = 0
     sent = 0
 
-    for customer in customers:
-        phone = format_phone_number(customer.phone, vendor_country_code)
-        if not phone:
-            continue
-        ok = _send_marketing_whatsapp_single(
-            phone=phone,
-            message=notification.message,
-            image_url=image_url or '',
-            template_name=template_name,
-            template_namespace=namespace,
-            has_image=has_image,
-            notification_id=notification.id,
-        )
-        if ok:
-            sent += 1
-        # Update progress in DB
-        WhatsAppNotification.objects.filter(pk=notification.pk).update(
-            sent_count=sent,
-        )
-
-    # Reload notification to get latest sent_count
-    notification.refresh_from_db()
-    all_success = sent == total and total > 0
-
-    with db_transaction.atomic():
-        n = WhatsAppNotification.objects.select_for_update().get(pk=notification.pk)
-        n.sent_count = sent
-        n.status = WhatsAppNotification.STATUS_SENT if all_success else WhatsAppNotification.STATUS_FAILED
-        n.save(update_fields=['sent_count', 'status', 'updated_at'])
+    phones = []
+    invalid = 0
+    # Only the phone column is needed; stream it instead of loading VendorCustomer instances
+    for customer_phone in notification.customers.values_list('phone', flat=True).iterator(chunk_size=500):
+        total += 1
+        phone = format_phone_number(customer_phone, vendor_country_code)
+        if phone:
+            phones.append(phone)
+        else:
+            invalid += 1
+    # Customers whose numbers format to the same phone get a single message
+    phones = list(dict.fromkeys(phones))
+
+    batches = [phones[i:i + MSG91_BATCH_SIZE] for i in range(0, len(phones), MSG91_BATCH_SIZE)]
+    if batches:
+        # Batches are independent network calls; keep a bounded number in flight.
+        # DB progress writes stay on this thread as results complete.
+        with ThreadPoolExecutor(max_workers=min(WHATSAPP_MAX_CONCURRENCY, len(batches))) as executor:
+            futures = [
+                executor.submit(
+                    _send_marketing_whatsapp_batch,
+                    phones=batch,
+                    message=notification.message,
+                    image_url=image_url or '',
+                    template_name=template_name,
+                    template_namespace=namespace,
+                    has_image=has_image,
+                    notification_id=notification.id,
+                )
+                for batch in batches
+            ]
+            pending = 0
+            last_flush = time.monotonic()
+            for future in as_completed(futures):
+                batch_sent = future.result()
+                sent += batch_sent
+                pending += batch_sent
+                # Flush progress to DB at most every PROGRESS_FLUSH_INTERVAL seconds;
+                # the exact final count is written with the status below.
+                if pending and time.monotonic() - last_flush >= PROGRESS_FLUSH_INTERVAL:
+                    WhatsAppNotification.objects.filter(pk=notification.pk).update(
+                        sent_count=F('sent_count') + pending,
+                    )
+                    pending = 0
+                    last_flush = time.monotonic()
+
+    all_success = total > 0 and invalid == 0 and sent == len(phones)
+
+    # sent is the authoritative local count, so a single UPDATE sets the final state
+    WhatsAppNotification.objects.filter(pk=notification.pk).update(
+        sent_count=sent,
+        status=WhatsAppNotification.STATUS_SENT if all_success else WhatsAppNotification.STATUS_FAILED,
+        updated_at=timezone.now(),
+    )
 
     # Charge for successfully sent messages (even if some failed), so transactions and due balance reflect actual usage
     if sent > 0:
         try:
-            super_setting = SuperSetting.objects.filter(id=1).first()
-            if super_setting and getattr(super_setting, 'is_whatsapp_usage', True):
-                per_usage = getattr(super_setting, 'whatsapp_per_usage', 0) or 0
-                if per_usage > 0:
-                    cost = sent * per_usage
-                    process_whatsapp_usage(notification.user, cost)
+            if is_whatsapp_usage and per_usage > 0:
+                cost = sent * per_usage
+                process_whatsapp_usage(notification.user, cost)
         except Exception as e:
             logger.error(f'Failed to process WhatsApp usage for notification #{notification.id}: {e}')
@@ -0,0 +1,14 @@
+"""
+Signal receivers for the core app, connected from CoreConfig.ready().
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import SuperSetting
+from .utils.settings_cache import clear_settings_cache
+
+
+@receiver(post_save, sender=SuperSetting)
+def clear_super_setting_cache(sender, **kwargs):
+    """Drop cached SuperSetting values (due threshold, WhatsApp marketing config) on save."""
+    clear_settings_cache()
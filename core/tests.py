@@ -1,3 +1,272 @@
-from django.test import TestCase
+import base64
+import hashlib
+import hmac
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .models import Order, QRStandOrder, SuperSetting, Transaction, User
+from .services import whatsapp_service
+from .utils import order_action_token
+from .views.invoice_views import generate_invoice_token
+from .utils.order_action_token import (
+    ORDER_ACTION_TOKEN_EXPIRY_SECONDS,
+    generate_order_action_token,
+    verify_order_action_token,
+)
+from .utils.settings_cache import DUE_THRESHOLD_CACHE_KEY, get_due_threshold
+from .utils.transaction_helpers import (
+    process_due_payment,
+    process_order_transactions,
+    process_qr_stand_payment,
+    process_subscription_payment,
+)
+
+
+class TransactionHelpersTests(TestCase):
+    """Rows, amounts and balances written by the process_* payment helpers."""
+
+    def setUp(self):
+        self.setting = SuperSetting.objects.create(expire_duration_month=1, balance=0)
+        self.vendor = User.objects.create(phone='9800000001', username='vendor', name='Vendor')
+
+    def system_balance(self):
+        return SuperSetting.objects.get(pk=self.setting.pk).balance
+
+    def due_balance(self):
+        return User.objects.get(pk=self.vendor.pk).due_balance
+
+    def test_order_payment(self):
+        order = Order.objects.create(name='Customer', user=self.vendor, phone='9800000002', total=100)
+
+        order_txn, fee_user, fee_system = process_order_transactions(order, self.vendor, 90, 10, {'utr': 'UTR1'})
+
+        self.assertEqual(Transaction.objects.filter(order=order).count(), 3)
+        self.assertEqual((order_txn.transaction_category, order_txn.transaction_type, order_txn.amount), ('order', 'in', 90))
+        self.assertEqual((fee_user.transaction_type, fee_user.is_system, fee_user.amount), ('out', False, 10))
+        self.assertEqual((fee_system.transaction_type, fee_system.is_system, fee_system.amount), ('in', True, 10))
+        self.assertEqual(Transaction.objects.filter(utr='UTR1').count(), 3)
+        # The fee is owed by the vendor; the system balance is untouched
+        self.assertEqual(self.due_balance(), 10)
+        self.assertEqual(self.vendor.due_balance, 10)
+        self.assertEqual(self.system_balance(), 0)
+
+    def test_due_payment(self):
+        User.objects.filter(pk=self.vendor.pk).update(due_balance=30)
+        self.vendor.refresh_from_db()
+
+        txn_user, txn_system = process_due_payment(self.vendor, 20)
+
+        self.assertEqual(Transaction.objects.filter(transaction_category='due_paid').count(), 2)
+        self.assertEqual((txn_user.transaction_type, txn_user.amount), ('out', 20))
+        self.assertEqual((txn_system.transaction_type, txn_system.amount), ('in', 20))
+        self.assertEqual(self.due_balance(), 10)
+        self.assertEqual(self.vendor.due_balance, 10)
+        self.assertEqual(self.system_balance(), 20)
+
+    def test_qr_stand_payment(self):
+        qr_order = QRStandOrder.objects.create(vendor=self.vendor, quantity=2, total_price=50)
+
+        process_qr_stand_payment(qr_order)
+
+        txns = Transaction.objects.filter(qr_stand_order=qr_order)
+        self.assertEqual(txns.count(), 2)
+        self.assertEqual(sorted(txns.values_list('transaction_type', 'amount')), [('in', 50), ('out', 50)])
+        self.assertEqual(self.system_balance(), 50)
+        self.assertEqual(self.due_balance(), 0)
+
+    def test_subscription_payment(self):
+        process_subscription_payment(self.vendor, 300, 3)
+
+        txns = Transaction.objects.filter(transaction_category='subscription_fee')
+        self.assertEqual(txns.count(), 2)
+        self.assertEqual(set(txns.values_list('amount', flat=True)), {300})
+        self.assertEqual(self.system_balance(), 300)
+        self.assertEqual(self.due_balance(), 0)
+
+    def test_failure_inside_atomic_block_rolls_back(self):
+        User.objects.filter(pk=self.vendor.pk).update(due_balance=30)
+        self.vendor.refresh_from_db()
+
+        # Fails after the transaction rows and the due UPDATE were written
+        with mock.patch(
+            'core.utils.transaction_helpers.update_system_balance',
+            side_effect=RuntimeError('boom'),
+        ):
+            with self.assertRaises(RuntimeError):
+                process_due_payment(self.vendor, 20)
+
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(self.due_balance(), 30)
+        self.assertEqual(self.vendor.due_balance, 30)
+        self.assertEqual(self.system_balance(), 0)
+
+
+class SettingsCacheTests(TestCase):
+    """SuperSetting values cached by core.utils.settings_cache."""
+
+    def setUp(self):
+        cache.delete(DUE_THRESHOLD_CACHE_KEY)
+        self.setting = SuperSetting.objects.create(expire_duration_month=1, due_threshold=500)
+
+    def test_due_threshold_is_cached_and_cleared_on_save(self):
+        self.assertEqual(get_due_threshold(), 500)
+        SuperSetting.objects.filter(pk=self.setting.pk).update(due_threshold=700)
+        # UPDATE bypasses post_save, so the cached value is still served
+        self.assertEqual(get_due_threshold(), 500)
+
+        self.setting.due_threshold = 800
+        self.setting.save()
+        self.assertEqual(get_due_threshold(), 800)
+
+
+class DuesListTests(TestCase):
+    """Page and cursor pagination of dues_list."""
+
+    def setUp(self):
+        SuperSetting.objects.create(expire_duration_month=1)
+        admin = User.objects.create(phone='9800000000', username='admin', name='Admin', is_superuser=True)
+        # Ties on due_balance are ordered by id
+        for i, due in enumerate([50, 30, 30, 30, 10]):
+            User.objects.create(phone=f'98100000{i:02d}', username=f'vendor{i}', name=f'Vendor {i}', due_balance=due)
+        self.client.force_login(admin)
+        self.url = reverse('dues_list')
+
+    def test_page_mode_keeps_response_shape(self):
+        data = self.client.get(self.url, {'page': 2, 'page_size': 2}).json()
+
+        self.assertEqual((data['page'], data['total_pages'], data['count']), (2, 3, 5))
+        self.assertNotIn('next_cursor', data)
+
+    def test_cursor_walk_across_due_balance_ties(self):
+        expected = list(
+            User.objects.filter(due_balance__gt=0, is_superuser=False)
+            .order_by('-due_balance', 'id').values_list('id', flat=True)
+        )
+        seen = []
+        cursor = ''
+        for _ in range(len(expected)):
+            data = self.client.get(self.url, {'cursor': cursor, 'page_size': 2}).json()
+            self.assertIsNone(data['page'])
+            self.assertIsNone(data['total_pages'])
+            seen.extend(vendor['id'] for vendor in data['vendors'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'abc'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderWhatsAppAsyncTests(TestCase):
+    """Background order WhatsApp sends are queued only after the transaction commits."""
+
+    def test_send_is_submitted_on_commit(self):
+        with mock.patch.object(whatsapp_service, '_ORDER_WHATSAPP_EXECUTOR') as executor:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                whatsapp_service.send_order_ready_whatsapp_async(42)
+                executor.submit.assert_not_called()
+
+        self.assertEqual(len(callbacks), 1)
+        executor.submit.assert_called_once_with(
+            whatsapp_service._run_order_whatsapp, whatsapp_service.send_order_ready_whatsapp, 42
+        )
+
+
+class OrderActionTokenTests(TestCase):
+    """Issue/verify round trip of order accept/reject tokens."""
+
+    NOW = 1_800_000_000
+
+    def at(self, ts):
+        return mock.patch.object(order_action_token.time, 'time', return_value=ts)
+
+    def test_round_trip(self):
+        with self.at(self.NOW):
+            token = generate_order_action_token(7)
+            self.assertEqual(len(token), 72)
+            self.assertTrue(verify_order_action_token(7, token))
+            self.assertTrue(verify_order_action_token('7', token))
+            self.assertFalse(verify_order_action_token(8, token))
+
+    def test_expiry(self):
+        with self.at(self.NOW):
+            token = generate_order_action_token(7)
+        # Valid for at least EXPIRY - BUCKET seconds, never past EXPIRY
+        with self.at(self.NOW + ORDER_ACTION_TOKEN_EXPIRY_SECONDS - order_action_token.ORDER_ACTION_TOKEN_BUCKET_SECONDS):
+            self.assertTrue(verify_order_action_token(7, token))
+        with self.at(self.NOW + ORDER_ACTION_TOKEN_EXPIRY_SECONDS + 1):
+            self.assertFalse(verify_order_action_token(7, token))
+
+    def test_tampering(self):
+        with self.at(self.NOW):
+            token = generate_order_action_token(7)
+            # Flip one hex digit in the expiry and one in the signature
+            for i in (7, len(token) - 1):
+                tampered = token[:i] + ('0' if token[i] != '0' else '1') + token[i + 1:]
+                self.assertFalse(verify_order_action_token(7, tampered))
+            self.assertFalse(verify_order_action_token(7, token[:-2]))
+            self.assertFalse(verify_order_action_token(7, 'z' * 72))
+            self.assertFalse(verify_order_action_token(7, ''))
+            self.assertFalse(verify_order_action_token(7, None))
+
+    def test_previous_format_still_accepted_until_expiry(self):
+        expiry_ts = self.NOW + ORDER_ACTION_TOKEN_EXPIRY_SECONDS
+        sig = hmac.new(settings.SECRET_KEY.encode('utf-8'), f'7:{expiry_ts}'.encode('utf-8'), hashlib.sha256).hexdigest()
+        token = base64.urlsafe_b64encode(f'{expiry_ts}:{sig}'.encode('utf-8')).decode('ascii').rstrip('=')
+
+        with self.at(self.NOW):
+            self.assertTrue(verify_order_action_token(7, token))
+            self.assertFalse(verify_order_action_token(8, token))
+        with self.at(expiry_ts + 1):
+            self.assertFalse(verify_order_action_token(7, token))
+
+
+class PublicInvoiceETagTests(TestCase):
+    """Conditional GETs on invoice_public_view."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.vendor = User.objects.create(phone='9800000001', username='vendor', name='Vendor')
+        self.order = Order.objects.create(name='Customer', user=self.vendor, phone='9800000002', total=100)
+        self.url = reverse('invoice_public_view', args=[self.order.id, generate_invoice_token(self.order.id)])
+
+    def test_unchanged_invoice_returns_304(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Host', first['Vary'])
+
+        again = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], first['ETag'])
+
+    def test_etag_changes_with_new_transaction_and_host(self):
+        etag = self.client.get(self.url)['ETag']
+        Transaction.objects.create(
+            order=self.order, user=self.vendor, amount=5, status='success',
+            transaction_type='out', transaction_category='transaction_fee',
+        )
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['order']['transaction_charge'], '5.00')
+
+        other_host = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'], HTTP_HOST='cafe.example.com')
+        self.assertEqual(other_host.status_code, 200)
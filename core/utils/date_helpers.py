@@ -2,7 +2,7 @@
 Helpers for parsing date-only query params into timezone-aware datetimes
 for filtering (start of day 00:01, end of day 23:59:59).
 """
-from datetime import datetime, time
+from datetime import date, datetime, time
 
 from django.utils import timezone
 
@@ -11,6 +11,12 @@ START_OF_DAY_TIME = time(0, 1, 0)  # 00:01 AM
 END_OF_DAY_TIME = time(23, 59, 59, 999999)  # 11:59 PM (end of day)
 
 
+def _parse_ymd(value):
+    """Parse 'YYYY-MM-DD' into a date (split + int; much cheaper than strptime)."""
+    year, month, day = value.strip().split('-')
+    return date(int(year), int(month), int(day))
+
+
 def parse_date_range(start_date_str, end_date_str):
     """
     Parse YYYY-MM-DD start/end strings into timezone-aware datetimes.
@@ -24,9 +30,9 @@ def parse_date_range(start_date_str, end_date_str):
     if not start_date_str or not end_date_str:
         return None
     try:
-        start_date = datetime.strptime(start_date_str.strip(), '%Y-%m-%d').date()
-        end_date = datetime.strptime(end_date_str.strip(), '%Y-%m-%d').date()
-    except (ValueError, TypeError):
+        start_date = _parse_ymd(start_date_str)
+        end_date = _parse_ymd(end_date_str)
+    except (ValueError, TypeError, AttributeError):
         return None
     start_naive = datetime.combine(start_date, START_OF_DAY_TIME)
     end_naive = datetime.combine(end_date, END_OF_DAY_TIME)
@@ -0,0 +1,25 @@
+"""
+JSON encode/decode for outbound gateway requests (MSG91, OnePG, UG) and raw request bodies.
+Uses orjson when installed (several times faster, bytes in/out); falls back to stdlib json.
+"""
+import json
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def json_dumps(payload) -> bytes:
+    """Serialize payload to UTF-8 JSON bytes for a request body."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode('utf-8')
+
+
+def json_loads(content):
+    """Parse a JSON body (bytes or str). Raises ValueError on invalid JSON or encoding."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(content)
+    return json.loads(content)
@@ -7,25 +7,85 @@ import hmac
 import hashlib
 import logging
 import requests
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.conf import settings
 
+from .json_helpers import json_dumps, json_loads
+
 logger = logging.getLogger(__name__)
 
+ONEPG_TIMEOUT = 30
+
+# Retry gateway-side 502/503/504 and connection errors; read=0 so a request that may
+# already have reached OnePG is not replayed. The final response is returned, not raised.
+ONEPG_RETRY = Retry(
+    total=2,
+    read=0,
+    backoff_factor=0.2,
+    status_forcelist=(502, 503, 504),
+    allowed_methods=frozenset(['POST']),
+    raise_on_status=False,
+)
+
+# Shared HTTP session so OnePG calls reuse pooled keep-alive (TLS) connections
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=ONEPG_RETRY))
+_SESSION.headers['Content-Type'] = 'application/json'
+
+
+@lru_cache(maxsize=4)
+def _basic_auth(username: str, password: str) -> str:
+    creds = base64.b64encode(f"{username}:{password}".encode()).decode()
+    return f"Basic {creds}"
+
 
 def get_auth_header():
     """Basic Auth header for OnePG API."""
     username = getattr(settings, 'NEPAL_PAYMENT_MERCHANT_NAME', '')
     password = getattr(settings, 'NEPAL_PAYMENT_API_PASSWORD', '')
-    creds = base64.b64encode(f"{username}:{password}".encode()).decode()
-    return {"Authorization": f"Basic {creds}"}
+    return {"Authorization": _basic_auth(username, password)}
+
+
+def get_onepg_session() -> requests.Session:
+    """
+    Return the shared OnePG requests.Session.
+    The Basic Auth header is set on the session and refreshed if the credentials change.
+    """
+    authorization = get_auth_header()["Authorization"]
+    if _SESSION.headers.get('Authorization') != authorization:
+        _SESSION.headers['Authorization'] = authorization
+    return _SESSION
+
+
+@lru_cache(maxsize=4)
+def _signature_hmac(key: str):
+    """Keyed HMAC-SHA512 with the key pads already computed; callers must .copy() it."""
+    return hmac.new(key.encode("utf-8"), digestmod=hashlib.sha512)
+
+
+def _sign(value: str) -> str:
+    h = _signature_hmac(getattr(settings, 'NEPAL_PAYMENT_KEY', '')).copy()
+    h.update(value.encode("utf-8"))
+    return h.hexdigest().lower()
 
 
 def generate_signature(payload: dict) -> str:
     """Payload: dict with string values. Keys sorted alphabetically, values concatenated."""
-    key = getattr(settings, 'NEPAL_PAYMENT_KEY', '')
     sorted_keys = sorted(payload.keys())
-    value = "".join(str(payload[k]) for k in sorted_keys)
-    return hmac.new(key.encode("utf-8"), value.encode("utf-8"), hashlib.sha512).hexdigest().lower()
+    return _sign("".join(str(payload[k]) for k in sorted_keys))
+
+
+# Fixed-shape signatures: values concatenated in the same sorted-key order that
+# generate_signature() would produce (Amount < MerchantId < MerchantName < MerchantTxnId).
+
+def _sig_get_process_id(merchant_id, merchant_name, amount, merchant_txn_id) -> str:
+    return _sign(f"{amount}{merchant_id}{merchant_name}{merchant_txn_id}")
+
+
+def _sig_check_status(merchant_id, merchant_name, merchant_txn_id) -> str:
+    return _sign(f"{merchant_id}{merchant_name}{merchant_txn_id}")
 
 
 def get_process_id(merchant_txn_id: str, amount: str) -> dict:
@@ -44,16 +104,13 @@ def get_process_id(merchant_txn_id: str, amount: str) -> dict:
         "Amount": str(amount),
         "MerchantTxnId": merchant_txn_id,
     }
-    payload["Signature"] = generate_signature(payload)
+    payload["Signature"] = _sig_get_process_id(
+        payload["MerchantId"], merchant_name, payload["Amount"], merchant_txn_id
+    )
 
     try:
-        r = requests.post(
-            url,
-            json=payload,
-            headers={**get_auth_header(), "Content-Type": "application/json"},
-            timeout=30,
-        )
-        data = r.json()
+        r = get_onepg_session().post(url, data=json_dumps(payload), timeout=ONEPG_TIMEOUT)
+        data = json_loads(r.content)
         if data.get("code") == "0" and data.get("data"):
             return {
                 "success": True,
@@ -78,6 +135,10 @@ def get_process_id(merchant_txn_id: str, amount: str) -> dict:
             "process_id": None,
             "message": message,
         }
+    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+        # Expected network failures: log without a traceback
+        logger.warning(f"GetProcessId network error ({type(e).__name__}) for {merchant_txn_id}: {e!s}")
+        return {"success": False, "process_id": None, "message": f"OnePG request failed: {e!s}"}
     except Exception as e:
         logger.exception("GetProcessId failed")
         return {"success": False, "process_id": None, "message": f"OnePG request failed: {e!s}"}
@@ -97,16 +158,11 @@ def check_transaction_status(merchant_txn_id: str) -> dict:
         "MerchantName": merchant_name,
         "MerchantTxnId": merchant_txn_id,
     }
-    payload["Signature"] = generate_signature(payload)
+    payload["Signature"] = _sig_check_status(payload["MerchantId"], merchant_name, merchant_txn_id)
 
     try:
-        r = requests.post(
-            url,
-            json=payload,
-            headers={**get_auth_header(), "Content-Type": "application/json"},
-            timeout=30,
-        )
-        data = r.json()
+        r = get_onepg_session().post(url, data=json_dumps(payload), timeout=ONEPG_TIMEOUT)
+        data = json_loads(r.content)
         if data.get("code") == "0" and data.get("data"):
             return {
                 "success": True,
@@ -120,6 +176,10 @@ def check_transaction_status(merchant_txn_id: str) -> dict:
             "data": None,
             "message": data.get("message", "Error") or str(data.get("errors", "")),
         }
+    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+        # Expected network failures: log without a traceback
+        logger.warning(f"CheckTransactionStatus network error ({type(e).__name__}) for {merchant_txn_id}: {e!s}")
+        return {"success": False, "status": None, "data": None, "message": str(e)}
     except Exception as e:
         logger.exception("CheckTransactionStatus failed")
         return {"success": False, "status": None, "data": None, "message": str(e)}
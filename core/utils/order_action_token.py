@@ -1,37 +1,83 @@
-"""Short-lived HMAC token for order accept/reject from notification (no session)."""
+"""
+Short-lived HMAC token for order accept/reject from notification (no session).
+
+Tokens are 72 hex chars: a 4-byte expiry timestamp followed by HMAC-SHA256 over
+"<order_id>:<expiry>". Tokens in the previous format (urlsafe base64 of
+"<expiry>:<hex sig>") are still accepted until they expire; since they lived at most
+ORDER_ACTION_TOKEN_EXPIRY_SECONDS, that fallback can be dropped once a release has been
+out for that long.
+"""
+import base64
+import binascii
 import hmac
 import hashlib
-import base64
 import time
+from functools import lru_cache
 from django.conf import settings
 
 ORDER_ACTION_TOKEN_EXPIRY_SECONDS = 600  # 10 minutes
 
+# Tokens are minted per 30s time bucket, so repeat sends for the same order reuse one token.
+# Expiry counts from the bucket start, so a token is valid for between
+# EXPIRY - BUCKET (570s) and EXPIRY (600s) after it is issued.
+ORDER_ACTION_TOKEN_BUCKET_SECONDS = 30
+
+# Token = hex(4-byte big-endian expiry timestamp + 32-byte HMAC-SHA256) -> 72 URL-safe chars
+_EXPIRY_BYTES = 4
+_TOKEN_BYTES = _EXPIRY_BYTES + hashlib.sha256().digest_size
+
+
+@lru_cache(maxsize=4)
+def _keyed_hmac(secret):
+    """HMAC-SHA256 keyed with SECRET_KEY (pads precomputed); callers must .copy() it."""
+    if isinstance(secret, str):
+        secret = secret.encode('utf-8')
+    return hmac.new(secret, digestmod=hashlib.sha256)
+
+
+def _sign(order_id, expiry_ts):
+    h = _keyed_hmac(settings.SECRET_KEY).copy()
+    h.update(f"{order_id}:{expiry_ts}".encode('utf-8'))
+    return h.digest()
+
+
+@lru_cache(maxsize=4096)
+def _token_for_bucket(order_id, bucket):
+    # Expiry counts from the bucket start: tokens live between 570s and 600s
+    expiry_ts = bucket * ORDER_ACTION_TOKEN_BUCKET_SECONDS + ORDER_ACTION_TOKEN_EXPIRY_SECONDS
+    return (expiry_ts.to_bytes(_EXPIRY_BYTES, 'big') + _sign(order_id, expiry_ts)).hex()
+
 
 def generate_order_action_token(order_id):
     """Generate a short-lived HMAC token for order accept/reject from notification."""
-    expiry_ts = int(time.time()) + ORDER_ACTION_TOKEN_EXPIRY_SECONDS
-    payload = f"{order_id}:{expiry_ts}"
-    secret = settings.SECRET_KEY.encode('utf-8') if isinstance(settings.SECRET_KEY, str) else settings.SECRET_KEY
-    sig = hmac.new(secret, payload.encode('utf-8'), hashlib.sha256).hexdigest()
-    raw = f"{expiry_ts}:{sig}"
-    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+    return _token_for_bucket(str(order_id), int(time.time()) // ORDER_ACTION_TOKEN_BUCKET_SECONDS)
 
 
 def verify_order_action_token(order_id, token):
     """Verify token for order_id; returns True if valid and not expired."""
-    if not token:
+    if not isinstance(token, str) or not token.isascii():
         return False
+    if len(token) != _TOKEN_BYTES * 2:
+        return _verify_legacy_token(order_id, token)
     try:
-        raw = base64.urlsafe_b64decode(token + '==')
-        raw_str = raw.decode('utf-8')
-        expiry_str, sig = raw_str.split(':', 1)
+        raw = bytes.fromhex(token)
+    except ValueError:
+        return False
+    if len(raw) != _TOKEN_BYTES:
+        return False
+    expiry_ts = int.from_bytes(raw[:_EXPIRY_BYTES], 'big')
+    if expiry_ts < int(time.time()):
+        return False
+    return hmac.compare_digest(_sign(order_id, expiry_ts), raw[_EXPIRY_BYTES:])
+
+
+def _verify_legacy_token(order_id, token):
+    """Verify a token in the previous urlsafe-base64 "<expiry>:<hex sig>" format."""
+    try:
+        expiry_str, sig = base64.urlsafe_b64decode(token + '==').decode('ascii').split(':', 1)
         expiry_ts = int(expiry_str)
-        if expiry_ts < int(time.time()):
-            return False
-        payload = f"{order_id}:{expiry_ts}"
-        secret = settings.SECRET_KEY.encode('utf-8') if isinstance(settings.SECRET_KEY, str) else settings.SECRET_KEY
-        expected = hmac.new(secret, payload.encode('utf-8'), hashlib.sha256).hexdigest()
-        return hmac.compare_digest(expected, sig)
-    except Exception:
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return False
+    if expiry_ts < int(time.time()):
         return False
+    return hmac.compare_digest(_sign(order_id, expiry_ts).hex(), sig)
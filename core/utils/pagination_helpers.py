@@ -0,0 +1,27 @@
+"""
+Pagination helper for list endpoints that return count/page/total_pages.
+"""
+from django.core.paginator import Paginator
+
+
+def paginate_queryset(queryset, page, page_size):
+    """
+    Fetch one page with Paginator semantics (page clamped to 1..total_pages),
+    skipping the COUNT(*) query when the page itself proves the total:
+    a short page (the last one) or an empty first page.
+
+    Returns:
+        tuple: (object_list, count, page, total_pages)
+    """
+    paginator = Paginator(queryset, page_size)
+    page = max(page, 1)
+    offset = (page - 1) * page_size
+    object_list = list(queryset[offset:offset + page_size])
+    if len(object_list) < page_size and (object_list or page == 1):
+        # Short page: everything up to the end of the result set is accounted for
+        paginator.count = offset + len(object_list)
+    total_pages = paginator.num_pages
+    if page > total_pages:
+        page = total_pages
+        object_list = list(paginator.page(page).object_list) if paginator.count else []
+    return object_list, paginator.count, page, total_pages
@@ -0,0 +1,61 @@
+"""
+Cached reads of SuperSetting values used on hot paths (dues views, WhatsApp marketing).
+
+Entries are dropped on SuperSetting save by core.signals, but the cache is per-process
+LocMemCache: the delete only reaches the process that saved, and other workers keep
+their copy until it expires. Timeouts are kept short for that reason.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from ..models import SuperSetting
+
+DUE_THRESHOLD_CACHE_KEY = 'due_threshold'
+DUE_THRESHOLD_CACHE_TIMEOUT = 60
+DEFAULT_DUE_THRESHOLD = 1000
+
+MARKETING_CONFIG_CACHE_KEY = 'whatsapp_marketing_config'
+MARKETING_CONFIG_CACHE_TIMEOUT = 60
+
+
+def _read_due_threshold():
+    setting = SuperSetting.objects.only('due_threshold').first()
+    return setting.due_threshold if setting else DEFAULT_DUE_THRESHOLD
+
+
+def get_due_threshold():
+    """Cached SuperSetting.due_threshold; hits the DB at most once per DUE_THRESHOLD_CACHE_TIMEOUT."""
+    return cache.get_or_set(DUE_THRESHOLD_CACHE_KEY, _read_due_threshold, DUE_THRESHOLD_CACHE_TIMEOUT)
+
+
+def _read_marketing_config():
+    """
+    Read marketing config from SuperSetting with Django settings fallback.
+
+    Returns:
+        Tuple of (template_marketing, template_imagemarketing, is_whatsapp_usage, whatsapp_per_usage)
+    """
+    template_marketing = getattr(settings, 'MSG91_WHATSAPP_TEMPLATE_MARKETING', 'mycafemarketing')
+    template_imagemarketing = getattr(settings, 'MSG91_WHATSAPP_TEMPLATE_IMAGE_MARKETING', 'mycafeimagemarketing')
+    try:
+        super_setting = SuperSetting.objects.filter(id=1).first()
+        if super_setting:
+            return (
+                getattr(super_setting, 'whatsapp_template_marketing', None) or template_marketing,
+                getattr(super_setting, 'whatsapp_template_imagemarketing', None) or template_imagemarketing,
+                getattr(super_setting, 'is_whatsapp_usage', True),
+                getattr(super_setting, 'whatsapp_per_usage', 0) or 0,
+            )
+    except Exception:
+        pass
+    return template_marketing, template_imagemarketing, False, 0
+
+
+def get_marketing_config():
+    """Cached _read_marketing_config(); hits the DB at most once per MARKETING_CONFIG_CACHE_TIMEOUT."""
+    return cache.get_or_set(MARKETING_CONFIG_CACHE_KEY, _read_marketing_config, MARKETING_CONFIG_CACHE_TIMEOUT)
+
+
+def clear_settings_cache():
+    """Drop every cached SuperSetting value (called on SuperSetting save)."""
+    cache.delete_many([DUE_THRESHOLD_CACHE_KEY, MARKETING_CONFIG_CACHE_KEY])
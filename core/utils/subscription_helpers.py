@@ -4,6 +4,9 @@ Effective end date = expire_date if set, else subscription_end_date.
 """
 from datetime import date
 
+from django.db.models import Case, CharField, Value, When
+from django.db.models.functions import Coalesce
+
 
 def get_effective_subscription_end_date(user):
     """
@@ -30,3 +33,24 @@ def get_subscription_state(user, today=None):
     if not user.is_active:
         return 'inactive_with_date'
     return 'active'
+
+
+def annotate_subscription_state(queryset, today=None):
+    """
+    Annotate a User queryset with `effective_end_date` and `subscription_state`,
+    computed in SQL with the same rules as get_subscription_state().
+    Use for vendor lists/counts instead of calling the helpers per row.
+    """
+    if today is None:
+        today = date.today()
+    return queryset.annotate(
+        effective_end_date=Coalesce('expire_date', 'subscription_end_date'),
+    ).annotate(
+        subscription_state=Case(
+            When(effective_end_date__isnull=True, then=Value('no_subscription')),
+            When(effective_end_date__lt=today, then=Value('expired')),
+            When(is_active=False, then=Value('inactive_with_date')),
+            default=Value('active'),
+            output_field=CharField(),
+        ),
+    )
@@ -7,7 +7,7 @@ When is_system=True, TWO transactions are created:
 - If system gives money (system_direction='out'): System pays OUT, User gets IN
 
 UG Payment Gateway Integration:
-All transaction creation functions support UG-specific fields through **extra_fields:
+All transaction creation functions support UG-specific fields through payment_data:
 - ug_order_id: UG Gateway order ID
 - ug_client_txn_id: Unique transaction ID sent to UG
 - ug_payment_url: Payment URL for redirect
@@ -17,9 +17,21 @@ All transaction creation functions support UG-specific fields through **extra_fi
 """
 
 from decimal import Decimal
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
 from ..models import Transaction, SuperSetting, User
 
 
+def _to_decimal(amount):
+    """Coerce amount to Decimal; Decimal and int skip the str() round-trip."""
+    if isinstance(amount, Decimal):
+        return amount
+    if isinstance(amount, int):
+        return Decimal(amount)
+    return Decimal(str(amount))
+
+
 def create_dual_transaction(
     user,
     amount,
@@ -30,7 +42,8 @@ def create_dual_transaction(
     order=None,
     qr_stand_order=None,
     status="success",
-    **extra_fields
+    commit=True,
+    payment_data=None
 ):
     """
     Create dual transactions for system-involved operations.
@@ -45,14 +58,13 @@ def create_dual_transaction(
         order: Order instance (optional)
         qr_stand_order: QRStandOrder instance (optional)
         status: Transaction status (default: 'success')
-        **extra_fields: Additional fields like utr, vpa, payer_name, bank_id,
+        commit: If False, return unsaved instances for the caller to bulk_create
+        payment_data: Optional dict of extra fields like utr, vpa, payer_name, bank_id,
             ug_order_id, ug_client_txn_id, ug_payment_url, ug_txn_date, ug_status, ug_remark
     
     Returns:
         tuple: (txn_user, txn_system) - Both transaction instances
     """
-    amount = Decimal(str(amount))
-    
     if system_direction == 'in':
         # System receives money - User pays OUT, System gets IN
         user_type = 'out'
@@ -62,33 +74,27 @@ def create_dual_transaction(
         user_type = 'in'
         system_type = 'out'
     
+    # Fields shared by both rows, built once
+    fields = {
+        'user': user,
+        'order': order,
+        'qr_stand_order': qr_stand_order,
+        'amount': _to_decimal(amount),
+        'status': status,
+        'transaction_category': category,
+    }
+    if payment_data:
+        fields.update(payment_data)
+    
     # Transaction 1: User's perspective (is_system=False)
-    txn_user = Transaction.objects.create(
-        user=user,
-        order=order,
-        qr_stand_order=qr_stand_order,
-        amount=amount,
-        status=status,
-        transaction_type=user_type,
-        transaction_category=category,
-        is_system=False,
-        remarks=remarks_user,
-        **extra_fields
-    )
+    txn_user = Transaction(transaction_type=user_type, is_system=False, remarks=remarks_user, **fields)
     
     # Transaction 2: System's perspective (is_system=True)
-    txn_system = Transaction.objects.create(
-        user=user,
-        order=order,
-        qr_stand_order=qr_stand_order,
-        amount=amount,
-        status=status,
-        transaction_type=system_type,
-        transaction_category=category,
-        is_system=True,
-        remarks=remarks_system,
-        **extra_fields
-    )
+    txn_system = Transaction(transaction_type=system_type, is_system=True, remarks=remarks_system, **fields)
+    
+    if commit:
+        # Both rows in a single INSERT
+        Transaction.objects.bulk_create([txn_user, txn_system])
     
     return txn_user, txn_system
 
@@ -102,7 +108,8 @@ def create_single_transaction(
     qr_stand_order=None,
     status="success",
     remarks="",
-    **extra_fields
+    commit=True,
+    payment_data=None
 ):
     """
     Create a single transaction (non-system operations).
@@ -116,54 +123,80 @@ def create_single_transaction(
         qr_stand_order: QRStandOrder instance (optional)
         status: Transaction status (default: 'success')
         remarks: Transaction remarks
-        **extra_fields: Additional fields like utr, vpa, payer_name, bank_id,
+        commit: If False, return an unsaved instance for the caller to bulk_create
+        payment_data: Optional dict of extra fields like utr, vpa, payer_name, bank_id,
             ug_order_id, ug_client_txn_id, ug_payment_url, ug_txn_date, ug_status, ug_remark
     
     Returns:
         Transaction: The created transaction instance
     """
-    amount = Decimal(str(amount))
-    
-    txn = Transaction.objects.create(
-        user=user,
-        order=order,
-        qr_stand_order=qr_stand_order,
-        amount=amount,
-        status=status,
-        transaction_type=txn_type,
-        transaction_category=category,
-        is_system=False,
-        remarks=remarks,
-        **extra_fields
-    )
+    fields = {
+        'user': user,
+        'order': order,
+        'qr_stand_order': qr_stand_order,
+        'amount': _to_decimal(amount),
+        'status': status,
+        'transaction_type': txn_type,
+        'transaction_category': category,
+        'is_system': False,
+        'remarks': remarks,
+    }
+    if payment_data:
+        fields.update(payment_data)
+    
+    txn = Transaction(**fields)
+    
+    if commit:
+        txn.save()
     
     return txn
 
 
-def update_system_balance(amount, operation='add'):
+# SuperSetting is a singleton; its pk is looked up once per process
+_SUPER_SETTING_PK = None
+
+
+def get_super_setting_pk(refresh=False):
+    """
+    Return the pk of the SuperSetting singleton (None if no row exists).
+    Cached at module level so balance updates can target the row directly.
+    """
+    global _SUPER_SETTING_PK
+    if _SUPER_SETTING_PK is None or refresh:
+        _SUPER_SETTING_PK = SuperSetting.objects.order_by('pk').values_list('pk', flat=True).first()
+    return _SUPER_SETTING_PK
+
+
+def update_system_balance(amount, operation='add', return_balance=True):
     """
     Update the system balance in SuperSettings.
     
     Args:
         amount: Amount to add or subtract
         operation: 'add' or 'subtract'
+        return_balance: If False, skip the follow-up SELECT and return None
     
     Returns:
-        int: New balance
+        int: New balance (None when return_balance is False)
     """
-    settings = SuperSetting.objects.first()
-    if not settings:
-        return 0
-    
     amount = int(amount)
+    delta = F('balance') + amount if operation == 'add' else F('balance') - amount
     
-    if operation == 'add':
-        settings.balance += amount
-    else:
-        settings.balance -= amount
+    setting_pk = get_super_setting_pk()
+    if setting_pk is None:
+        return 0
     
-    settings.save()
-    return settings.balance
+    # Single atomic UPDATE on the singleton row (no read-modify-write race)
+    if not SuperSetting.objects.filter(pk=setting_pk).update(balance=delta, updated_at=timezone.now()):
+        # Cached row is gone (settings recreated); look it up again once
+        setting_pk = get_super_setting_pk(refresh=True)
+        if setting_pk is None or not SuperSetting.objects.filter(pk=setting_pk).update(
+            balance=delta, updated_at=timezone.now()
+        ):
+            return 0
+    if not return_balance:
+        return None
+    return SuperSetting.objects.filter(pk=setting_pk).values_list('balance', flat=True).first()
 
 
 def update_user_balance(user, amount, operation='add'):
@@ -179,17 +212,14 @@ def update_user_balance(user, amount, operation='add'):
         int: New balance
     """
     amount = int(amount)
+    delta = F('balance') + amount if operation == 'add' else F('balance') - amount
     
-    if operation == 'add':
-        user.balance += amount
-    else:
-        user.balance -= amount
-    
-    user.save()
+    User.objects.filter(pk=user.pk).update(balance=delta, updated_at=timezone.now())
+    user.refresh_from_db(fields=['balance'])
     return user.balance
 
 
-def update_user_due_balance(user, amount, operation='add'):
+def update_user_due_balance(user, amount, operation='add', refresh=True):
     """
     Update user's due balance.
     
@@ -197,18 +227,20 @@ def update_user_due_balance(user, amount, operation='add'):
         user: User instance
         amount: Amount to add or subtract
         operation: 'add' or 'subtract'
+        refresh: If False, skip the follow-up SELECT and apply the change to the
+            in-memory instance instead
     
     Returns:
         int: New due balance
     """
     amount = int(amount)
+    delta = F('due_balance') + amount if operation == 'add' else F('due_balance') - amount
     
-    if operation == 'add':
-        user.due_balance += amount
+    User.objects.filter(pk=user.pk).update(due_balance=delta, updated_at=timezone.now())
+    if refresh:
+        user.refresh_from_db(fields=['due_balance'])
     else:
-        user.due_balance -= amount
-    
-    user.save()
+        user.due_balance += amount if operation == 'add' else -amount
     return user.due_balance
 
 
@@ -230,31 +262,41 @@ def process_order_transactions(order, vendor, order_amount, transaction_fee, pay
     """
     payment_data = payment_data or {}
     
-    # 1. Create Order Payment Transaction (Single - not system)
-    order_txn = create_single_transaction(
-        user=vendor,
-        amount=order_amount,
-        category='order',
-        txn_type='in',
-        order=order,
-        remarks=f"Order #{order.id} payment from customer",
-        **payment_data
-    )
-    
-    # 2. Create Transaction Fee (Dual Transaction - system receives)
-    fee_txn_user, fee_txn_system = create_dual_transaction(
-        user=vendor,
-        amount=transaction_fee,
-        category='transaction_fee',
-        system_direction='in',
-        remarks_user=f"Transaction fee for Order #{order.id}",
-        remarks_system=f"Transaction fee received for Order #{order.id}",
-        order=order,
-        **payment_data
-    )
-    
-    # 3. Update vendor's due balance
-    update_user_due_balance(vendor, transaction_fee, 'add')
+    with db_transaction.atomic():
+        # 1. Order Payment Transaction (Single - not system)
+        order_txn = create_single_transaction(
+            user=vendor,
+            amount=order_amount,
+            category='order',
+            txn_type='in',
+            order=order,
+            remarks=f"Order #{order.id} payment from customer",
+            commit=False,
+            payment_data=payment_data
+        )
+        
+        # 2. Transaction Fee (Dual Transaction - system receives)
+        fee_txn_user, fee_txn_system = create_dual_transaction(
+            user=vendor,
+            amount=transaction_fee,
+            category='transaction_fee',
+            system_direction='in',
+            remarks_user=f"Transaction fee for Order #{order.id}",
+            remarks_system=f"Transaction fee received for Order #{order.id}",
+            order=order,
+            commit=False,
+            payment_data=payment_data
+        )
+        
+        # All three rows in a single INSERT
+        Transaction.objects.bulk_create([order_txn, fee_txn_user, fee_txn_system])
+        
+        # 3. Update vendor's due balance (single UPDATE, no row fetch)
+        User.objects.filter(pk=vendor.pk).update(
+            due_balance=F('due_balance') + int(transaction_fee), updated_at=timezone.now()
+        )
+    # In-memory copy only once the writes are committed (a rollback leaves it untouched)
+    vendor.due_balance += int(transaction_fee)
     
     return order_txn, fee_txn_user, fee_txn_system
 
@@ -274,20 +316,21 @@ def process_qr_stand_payment(qr_order, payment_data=None):
     """
     payment_data = payment_data or {}
     
-    # Create dual transaction
-    txn_user, txn_system = create_dual_transaction(
-        user=qr_order.vendor,
-        amount=qr_order.total_price,
-        category='qr_stand_order',
-        system_direction='in',
-        remarks_user=f"QR Stand Order #{qr_order.id} payment",
-        remarks_system=f"QR Stand Order #{qr_order.id} received",
-        qr_stand_order=qr_order,
-        **payment_data
-    )
-    
-    # Update system balance
-    update_system_balance(qr_order.total_price, 'add')
+    with db_transaction.atomic():
+        # Create dual transaction
+        txn_user, txn_system = create_dual_transaction(
+            user=qr_order.vendor,
+            amount=qr_order.total_price,
+            category='qr_stand_order',
+            system_direction='in',
+            remarks_user=f"QR Stand Order #{qr_order.id} payment",
+            remarks_system=f"QR Stand Order #{qr_order.id} received",
+            qr_stand_order=qr_order,
+            payment_data=payment_data
+        )
+    
+        # Update system balance (UPDATE only; callers don't need the new value)
+        update_system_balance(qr_order.total_price, 'add', return_balance=False)
     
     return txn_user, txn_system
 
@@ -309,19 +352,20 @@ def process_subscription_payment(user, amount, months, payment_data=None):
     """
     payment_data = payment_data or {}
     
-    # Create dual transaction
-    txn_user, txn_system = create_dual_transaction(
-        user=user,
-        amount=amount,
-        category='subscription_fee',
-        system_direction='in',
-        remarks_user=f"Subscription payment for {months} month(s)",
-        remarks_system=f"Subscription fee received from {user.name}",
-        **payment_data
-    )
-    
-    # Update system balance
-    update_system_balance(amount, 'add')
+    with db_transaction.atomic():
+        # Create dual transaction
+        txn_user, txn_system = create_dual_transaction(
+            user=user,
+            amount=amount,
+            category='subscription_fee',
+            system_direction='in',
+            remarks_user=f"Subscription payment for {months} month(s)",
+            remarks_system=f"Subscription fee received from {user.name}",
+            payment_data=payment_data
+        )
+    
+        # Update system balance (UPDATE only; callers don't need the new value)
+        update_system_balance(amount, 'add', return_balance=False)
     
     return txn_user, txn_system
 
@@ -342,22 +386,26 @@ def process_due_payment(vendor, amount, payment_data=None):
     """
     payment_data = payment_data or {}
     
-    # Create dual transaction
-    txn_user, txn_system = create_dual_transaction(
-        user=vendor,
-        amount=amount,
-        category='due_paid',
-        system_direction='in',
-        remarks_user=f"Due payment of {amount}",
-        remarks_system=f"Due payment received from {vendor.name}",
-        **payment_data
-    )
-    
-    # Update vendor's due balance
-    update_user_due_balance(vendor, amount, 'subtract')
-    
-    # Update system balance
-    update_system_balance(amount, 'add')
+    with db_transaction.atomic():
+        # Create dual transaction
+        txn_user, txn_system = create_dual_transaction(
+            user=vendor,
+            amount=amount,
+            category='due_paid',
+            system_direction='in',
+            remarks_user=f"Due payment of {amount}",
+            remarks_system=f"Due payment received from {vendor.name}",
+            payment_data=payment_data
+        )
+    
+        # Update vendor's due balance (single UPDATE, no refetch)
+        User.objects.filter(pk=vendor.pk).update(
+            due_balance=F('due_balance') - int(amount), updated_at=timezone.now()
+        )
+    
+        # Update system balance (UPDATE only; callers don't need the new value)
+        update_system_balance(amount, 'add', return_balance=False)
+    vendor.due_balance -= int(amount)
     
     return txn_user, txn_system
 
@@ -374,20 +422,21 @@ def process_share_distribution(shareholder, amount):
     Returns:
         tuple: (txn_system, txn_user)
     """
-    # Create dual transaction (system pays OUT, user gets IN)
-    txn_user, txn_system = create_dual_transaction(
-        user=shareholder,
-        amount=amount,
-        category='share_distribution',
-        system_direction='out',
-        remarks_user=f"Share distribution received",
-        remarks_system=f"Share distribution to {shareholder.name}",
-    )
-    
-    # Update shareholder balance
-    update_user_balance(shareholder, amount, 'add')
-    
-    # Note: System balance is updated separately after all distributions
+    with db_transaction.atomic():
+        # Create dual transaction (system pays OUT, user gets IN)
+        txn_user, txn_system = create_dual_transaction(
+            user=shareholder,
+            amount=amount,
+            category='share_distribution',
+            system_direction='out',
+            remarks_user=f"Share distribution received",
+            remarks_system=f"Share distribution to {shareholder.name}",
+        )
+    
+        # Update shareholder balance
+        update_user_balance(shareholder, amount, 'add')
+    
+        # Note: System balance is updated separately after all distributions
     
     return txn_system, txn_user
 
@@ -432,23 +481,28 @@ def process_whatsapp_usage(vendor, cost):
     """
     if cost <= 0:
         return None
-    # Re-fetch user from DB so we use a fresh instance (avoids stale ref in background thread)
+    # Re-fetch user from DB so we use a fresh instance (avoids stale ref in background thread);
+    # only the columns used below are loaded
     try:
-        vendor = User.objects.get(pk=vendor.pk)
+        vendor = User.objects.only('id', 'name', 'due_balance').get(pk=vendor.pk)
     except (User.DoesNotExist, AttributeError):
         return None
 
-    # Create dual transaction
-    txn_user, txn_system = create_dual_transaction(
-        user=vendor,
-        amount=cost,
-        category='whatsapp_usage',
-        system_direction='in',
-        remarks_user="WhatsApp usage charge",
-        remarks_system=f"WhatsApp usage fee from {vendor.name}",
-    )
-    
-    # Update vendor's due balance
-    update_user_due_balance(vendor, cost, 'add')
+    with db_transaction.atomic():
+        # Create dual transaction
+        txn_user, txn_system = create_dual_transaction(
+            user=vendor,
+            amount=cost,
+            category='whatsapp_usage',
+            system_direction='in',
+            remarks_user="WhatsApp usage charge",
+            remarks_system=f"WhatsApp usage fee from {vendor.name}",
+        )
+    
+        # Update vendor's due balance (single UPDATE, no refetch)
+        User.objects.filter(pk=vendor.pk).update(
+            due_balance=F('due_balance') + int(cost), updated_at=timezone.now()
+        )
+    vendor.due_balance += int(cost)
     
     return txn_user, txn_system
@@ -7,12 +7,56 @@ It handles creating payment orders and checking payment status.
 
 import requests
 import logging
+import threading
 import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from datetime import date
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.conf import settings
+from django.core.cache import cache
+
+from .json_helpers import json_dumps, json_loads
 
 logger = logging.getLogger(__name__)
 
+# (connect, read) timeout for UG API requests
+UG_TIMEOUT = (5, 30)
+
+# Retry rate limits (honouring Retry-After) and connection errors with exponential backoff.
+# Only 429 is retried by status: UG refused the request unprocessed. A 5xx may come after
+# create_order was accepted, and replaying it would fail as a duplicate client_txn_id (or
+# open a second payment), so it is returned to the caller. read=0 likewise never replays a
+# request that may already have reached UG. The final response is returned, not raised.
+UG_RETRY = Retry(
+    total=3,
+    read=0,
+    backoff_factor=0.3,
+    status_forcelist=(429,),
+    allowed_methods=frozenset(['POST']),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+# Shared HTTP session so all UGPaymentClient instances reuse pooled keep-alive connections
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=UG_RETRY))
+_SESSION.headers['Content-Type'] = 'application/json'
+
+# Final UG statuses never change, so they are cached and served without calling UG again.
+# The default cache is per-process LocMemCache, so each worker caches (and asks UG) separately.
+UG_TERMINAL_STATUSES = ('success', 'failure')
+UG_STATUS_CACHE_PREFIX = 'ug_order_status:'
+UG_STATUS_CACHE_TIMEOUT = 300
+
+# In-flight check_order_status calls by client_txn_id (frontend callback and UG webhook
+# often poll the same transaction at once); concurrent callers in this process share one
+# HTTP request. Followers wait at most UG_INFLIGHT_WAIT (the UG read timeout), then call
+# UG themselves, so a hung leader can't block every status check for the transaction.
+UG_INFLIGHT_WAIT = UG_TIMEOUT[1]
+_INFLIGHT = {}
+_INFLIGHT_LOCK = threading.Lock()
+
 
 class UGPaymentClient:
     """
@@ -42,6 +86,7 @@ class UGPaymentClient:
         self.api_key = (api_key or '').strip() if api_key is not None else getattr(settings, 'UG_API_KEY', '')
         self.base_url = getattr(settings, 'UG_API_BASE_URL', 'https://api.ekqr.in/api')
         self.redirect_base_url = getattr(settings, 'PAYMENT_REDIRECT_BASE_URL', '')
+        self.session = _SESSION
         
         if not self.api_key:
             logger.warning("UG API key not configured (no api_key passed and UG_API_KEY not in settings)")
@@ -114,14 +159,9 @@ class UGPaymentClient:
         try:
             logger.info(f"Creating UG payment order: {client_txn_id}, amount: {amount}")
             
-            response = requests.post(
-                url,
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=30
-            )
+            response = self.session.post(url, data=json_dumps(payload), timeout=UG_TIMEOUT)
             
-            data = response.json()
+            data = json_loads(response.content)
             
             if data.get("status") is True:
                 logger.info(f"UG order created successfully: {data.get('data', {}).get('order_id')}")
@@ -156,6 +196,15 @@ class UGPaymentClient:
                 "payment_url": None,
                 "message": f"Payment gateway error: {str(e)}"
             }
+        except (ValueError, AttributeError) as e:
+            # Non-JSON or non-object response body (e.g. an HTML error page)
+            logger.error(f"Invalid UG API response in create_order: {str(e)}")
+            return {
+                "success": False,
+                "order_id": None,
+                "payment_url": None,
+                "message": "Invalid response from payment gateway"
+            }
         except Exception as e:
             logger.error(f"Unexpected error in create_order: {str(e)}")
             return {
@@ -169,6 +218,10 @@ class UGPaymentClient:
         """
         Check the status of a payment order.
         
+        Terminal results (success/failure) are cached for UG_STATUS_CACHE_TIMEOUT, and
+        concurrent checks for the same client_txn_id in this process share a single request
+        to UG (waiting at most UG_INFLIGHT_WAIT for it).
+        
         Args:
             client_txn_id: Your unique transaction ID
             txn_date: Date of the transaction
@@ -184,6 +237,38 @@ class UGPaymentClient:
                 - remark: str
                 - message: str (error message if API call failed)
         """
+        cache_key = f"{UG_STATUS_CACHE_PREFIX}{client_txn_id}"
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
+        with _INFLIGHT_LOCK:
+            future = _INFLIGHT.get(client_txn_id)
+            is_leader = future is None
+            if is_leader:
+                future = _INFLIGHT[client_txn_id] = Future()
+        if not is_leader:
+            try:
+                return dict(future.result(timeout=UG_INFLIGHT_WAIT))
+            except FutureTimeoutError:
+                logger.warning(f"UG status check for {client_txn_id} still in flight, requesting directly")
+                return self._request_order_status(client_txn_id, txn_date)
+        
+        try:
+            result = self._request_order_status(client_txn_id, txn_date)
+            if result["success"] and result["status"] in UG_TERMINAL_STATUSES:
+                cache.set(cache_key, result, UG_STATUS_CACHE_TIMEOUT)
+            future.set_result(result)
+            return dict(result)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with _INFLIGHT_LOCK:
+                _INFLIGHT.pop(client_txn_id, None)
+    
+    def _request_order_status(self, client_txn_id: str, txn_date: date) -> dict:
+        """Call UG check_order_status; see check_order_status() for the returned dict."""
         url = f"{self.base_url}/check_order_status"
         
         # Format date as DD-MM-YYYY (UG expects this format)
@@ -200,14 +285,9 @@ class UGPaymentClient:
             logger.info(f"UG check_order_status request: client_txn_id={client_txn_id}, txn_date={txn_date_str}")
             logger.debug(f"UG API payload (key hidden): client_txn_id={client_txn_id}, txn_date={txn_date_str}")
             
-            response = requests.post(
-                url,
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=30
-            )
+            response = self.session.post(url, data=json_dumps(payload), timeout=UG_TIMEOUT)
             
-            data = response.json()
+            data = json_loads(response.content)
             
             # Log the raw response for debugging
             logger.info(f"UG API response: status={data.get('status')}, msg={data.get('msg')}")
@@ -268,6 +348,19 @@ class UGPaymentClient:
                 "remark": "",
                 "message": f"Payment gateway error: {str(e)}"
             }
+        except (ValueError, AttributeError) as e:
+            # Non-JSON or non-object response body (e.g. an HTML error page)
+            logger.error(f"Invalid UG API response in check_order_status: {str(e)}")
+            return {
+                "success": False,
+                "status": "unknown",
+                "utr": "",
+                "vpa": "",
+                "amount": 0,
+                "customer_name": "",
+                "remark": "",
+                "message": "Invalid response from payment gateway"
+            }
         except Exception as e:
             logger.error(f"Unexpected error in check_order_status: {str(e)}")
             return {
@@ -3,9 +3,9 @@ from rest_framework.response import Response
 from rest_framework import status
 import json
 from django.db.models import Q
-from django.core.paginator import Paginator
 from ..models import Category
 from ..serializers import CategorySerializer
+from ..utils.pagination_helpers import paginate_queryset
 
 
 @api_view(['GET'])
@@ -28,7 +28,11 @@ def category_list(request):
         
         # Filter by user - superusers can see all categories and filter by user_id
         if request.user.is_superuser:
-            queryset = Category.objects.all()
+            # Superusers get user_info per row: join the owner, loading only the columns it reads
+            queryset = Category.objects.select_related('user').only(
+                'id', 'name', 'image', 'user', 'created_at', 'updated_at',
+                'user__id', 'user__name', 'user__phone', 'user__logo',
+            )
             if user_id:
                 try:
                     queryset = queryset.filter(user_id=int(user_id))
@@ -50,22 +54,14 @@ def category_list(request):
         # Order by created_at
         queryset = queryset.order_by('-created_at')
         
-        # Paginate
-        paginator = Paginator(queryset, page_size)
-        total_pages = paginator.num_pages
-        
-        if page > total_pages:
-            page = total_pages
-        if page < 1:
-            page = 1
+        # Paginate (COUNT(*) skipped when the page is short)
+        object_list, count, page, total_pages = paginate_queryset(queryset, page, page_size)
         
-        page_obj = paginator.get_page(page)
-        
-        serializer = CategorySerializer(page_obj.object_list, many=True, context={'request': request})
+        serializer = CategorySerializer(object_list, many=True, context={'request': request})
         
         return Response({
             'data': serializer.data,
-            'count': paginator.count,
+            'count': count,
             'page': page,
             'page_size': page_size,
             'total_pages': total_pages
@@ -97,14 +93,11 @@ def category_create(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        category = Category.objects.create(
-            name=name,
-            user=request.user
-        )
-        
+        # Single INSERT including the image path
+        category = Category(name=name, user=request.user)
         if image:
             category.image = image
-            category.save()
+        category.save()
         
         serializer = CategorySerializer(category, context={'request': request})
         return Response({'category': serializer.data}, status=status.HTTP_201_CREATED)
@@ -159,13 +152,16 @@ def category_edit(request, id):
         name = request.POST.get('name')
         image = request.FILES.get('image')
         
+        update_fields = ['updated_at']
         if name:
             category.name = name
+            update_fields.append('name')
         
         if image:
             category.image = image
+            update_fields.append('image')
         
-        category.save()
+        category.save(update_fields=update_fields)
         
         serializer = CategorySerializer(category, context={'request': request})
         return Response({'category': serializer.data}, status=status.HTTP_200_OK)
@@ -1,16 +1,22 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Q, Sum
+from django.db.models import Count, Q, Sum
 from django.core.paginator import Paginator
-import json
 import logging
-from ..models import User, SuperSetting
+from ..models import User
 from ..serializers import VendorDueSerializer
+from ..utils.settings_cache import get_due_threshold
 # NOTE: process_due_payment is now called in payment_views.py on payment success
 
 logger = logging.getLogger(__name__)
 
+# User columns read by VendorDueSerializer
+VENDOR_DUE_FIELDS = (
+    'id', 'name', 'phone', 'country_code', 'logo',
+    'balance', 'due_balance', 'created_at', 'updated_at',
+)
+
 
 @api_view(['GET'])
 def due_status(request):
@@ -22,9 +28,8 @@ def due_status(request):
         )
     
     try:
-        # Get settings for threshold
-        settings = SuperSetting.objects.first()
-        due_threshold = settings.due_threshold if settings else 1000
+        # Threshold from SuperSetting (cached)
+        due_threshold = get_due_threshold()
         
         # Get user's due balance
         due_balance = request.user.due_balance
@@ -48,7 +53,13 @@ def due_status(request):
 
 @api_view(['GET'])
 def dues_list(request):
-    """List all vendors with outstanding dues"""
+    """
+    List all vendors with outstanding dues.
+    Paged by ?page= (page/total_pages in the response, as before), or for superusers by
+    ?cursor=: empty for the first page, then the next_cursor of the previous response.
+    Only cursor-mode responses carry next_cursor (null on the last page); page and
+    total_pages are null there, since next_cursor is the only navigation.
+    """
     if not request.user.is_authenticated:
         return Response(
             {'error': 'Not authenticated'},
@@ -62,28 +73,43 @@ def dues_list(request):
         page_size = int(request.GET.get('page_size', 10))
         over_threshold_only = request.GET.get('over_threshold', '').lower() == 'true'
         
-        # Get settings for threshold
-        settings = SuperSetting.objects.first()
-        due_threshold = settings.due_threshold if settings else 1000
+        # Threshold from SuperSetting (cached)
+        due_threshold = get_due_threshold()
         
-        # Superusers see all vendors, regular users see only their own
-        if request.user.is_superuser:
-            # Get all vendors with dues > 0
-            queryset = User.objects.filter(due_balance__gt=0, is_superuser=False)
-        else:
-            # Regular users can only see their own dues
-            if request.user.due_balance > 0:
-                queryset = User.objects.filter(id=request.user.id)
-            else:
-                return Response({
-                    'vendors': [],
-                    'count': 0,
-                    'page': 1,
-                    'total_pages': 0,
-                    'page_size': page_size,
-                    'total_dues': 0,
-                    'due_threshold': due_threshold
-                }, status=status.HTTP_200_OK)
+        # Regular users can only see their own dues: filter the session user in
+        # memory instead of running search/aggregate/pagination queries on one row
+        if not request.user.is_superuser:
+            user = request.user
+            due_balance = user.due_balance
+            matches = due_balance > 0
+            if matches and over_threshold_only:
+                matches = due_balance > due_threshold
+            if matches and search:
+                needle = search.lower()
+                matches = needle in (user.name or '').lower() or needle in (user.phone or '').lower()
+            
+            vendors = []
+            if matches:
+                vendors = [VendorDueSerializer(
+                    user,
+                    context={'request': request, 'due_threshold': due_threshold}
+                ).data]
+            
+            return Response({
+                'vendors': vendors,
+                'count': len(vendors),
+                'page': 1,
+                # As before: 0 pages when the vendor owes nothing, otherwise the single
+                # (possibly filtered-out) page of the Paginator over their own row
+                'total_pages': 1 if due_balance > 0 else 0,
+                'page_size': page_size,
+                'total_dues': due_balance if matches else 0,
+                'due_threshold': due_threshold,
+                'over_threshold_count': int(matches and due_balance > due_threshold)
+            }, status=status.HTTP_200_OK)
+        
+        # Superusers see all vendors with dues > 0
+        queryset = User.objects.filter(due_balance__gt=0, is_superuser=False)
         
         # Filter by over threshold
         if over_threshold_only:
@@ -95,40 +121,73 @@ def dues_list(request):
                 Q(name__icontains=search) | Q(phone__icontains=search)
             )
         
-        # Order by due_balance (highest first)
-        queryset = queryset.order_by('-due_balance')
+        # Order by due_balance (highest first, id as tiebreaker for cursors); load only the serialized columns
+        queryset = queryset.order_by('-due_balance', 'id').only(*VENDOR_DUE_FIELDS)
+        
+        # Count, total dues and over-threshold count in one aggregate query
+        stats = queryset.aggregate(
+            count=Count('id'),
+            total_dues=Sum('due_balance'),
+            over_threshold_count=Count('id', filter=Q(due_balance__gt=due_threshold)),
+        )
         
-        # Paginate
+        # Paginate (count already known, so Paginator doesn't run its own COUNT(*))
         paginator = Paginator(queryset, page_size)
+        paginator.count = stats['count']
         total_pages = paginator.num_pages
         
-        if page > total_pages and total_pages > 0:
-            page = total_pages
-        if page < 1:
-            page = 1
-        
-        page_obj = paginator.get_page(page)
+        cursor_mode = 'cursor' in request.GET
+        if cursor_mode:
+            # Keyset pagination: continue after the "<due_balance>:<id>" row from a previous
+            # next_cursor, so deep pages don't pay for an OFFSET scan
+            cursor = request.GET['cursor'].strip()
+            rows = queryset
+            if cursor:
+                try:
+                    last_due, last_id = (int(part) for part in cursor.split(':'))
+                except ValueError:
+                    return Response(
+                        {'error': 'Invalid cursor'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                rows = rows.filter(
+                    Q(due_balance__lt=last_due) | Q(due_balance=last_due, id__gt=last_id)
+                )
+            rows = list(rows[:page_size + 1])
+            vendors = rows[:page_size]
+            # A cursor has no page number: next_cursor is the only navigation in this mode
+            page = total_pages = None
+        else:
+            if page > total_pages and total_pages > 0:
+                page = total_pages
+            if page < 1:
+                page = 1
+            
+            vendors = paginator.get_page(page).object_list
         
         serializer = VendorDueSerializer(
-            page_obj, 
+            vendors, 
             many=True, 
             context={'request': request, 'due_threshold': due_threshold}
         )
         
-        # Calculate total dues
-        total_dues = queryset.aggregate(total=Sum('due_balance'))['total'] or 0
-        over_threshold_count = queryset.filter(due_balance__gt=due_threshold).count()
-        
-        return Response({
+        data = {
             'vendors': serializer.data,
             'count': paginator.count,
             'page': page,
             'total_pages': total_pages,
             'page_size': page_size,
-            'total_dues': total_dues,
+            'total_dues': stats['total_dues'] or 0,
             'due_threshold': due_threshold,
-            'over_threshold_count': over_threshold_count
-        }, status=status.HTTP_200_OK)
+            'over_threshold_count': stats['over_threshold_count']
+        }
+        if cursor_mode:
+            next_cursor = None
+            if len(rows) > page_size:
+                last = vendors[-1]
+                next_cursor = f'{last.due_balance}:{last.id}'
+            data['next_cursor'] = next_cursor
+        return Response(data, status=status.HTTP_200_OK)
         
     except Exception as e:
         logger.error(f'Error listing dues: {str(e)}')
@@ -148,7 +207,11 @@ def due_detail(request, id):
         )
     
     try:
-        user = User.objects.get(id=id)
+        # Vendors viewing their own dues: the session user is already loaded
+        if id == request.user.id:
+            user = request.user
+        else:
+            user = User.objects.only(*VENDOR_DUE_FIELDS).get(id=id)
         
         # Check permissions
         if not request.user.is_superuser and user != request.user:
@@ -157,8 +220,7 @@ def due_detail(request, id):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        settings = SuperSetting.objects.first()
-        due_threshold = settings.due_threshold if settings else 1000
+        due_threshold = get_due_threshold()
         
         serializer = VendorDueSerializer(
             user, 
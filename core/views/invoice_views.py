@@ -3,45 +3,61 @@ Invoice views for generating and downloading PDF bills
 """
 import hmac
 import hashlib
-import json
+from functools import lru_cache
+from urllib.parse import quote
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse
 from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
 from django.conf import settings
-from django.db.models import Sum
+from django.db.models import Prefetch
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
 from datetime import datetime
-from ..models import Order, Invoice
+from ..models import Order, OrderItem, Invoice
 from ..services.pdf_service import generate_order_invoice, generate_invoice_pdf_from_payload
+from ..utils.json_helpers import json_loads
 
 
 # Secret key for generating public invoice tokens
 INVOICE_TOKEN_SECRET = getattr(settings, 'INVOICE_TOKEN_SECRET', settings.SECRET_KEY)
 
+# Order columns read by the invoice views and generate_order_invoice (skips address, fcm_token, ...)
+INVOICE_ORDER_FIELDS = ('id', 'user', 'name', 'phone', 'total', 'created_at')
+# invoice_public_view also returns the status and the joined vendor's details
+PUBLIC_INVOICE_ORDER_FIELDS = INVOICE_ORDER_FIELDS + (
+    'status', 'updated_at',
+    'user__id', 'user__name', 'user__phone', 'user__address', 'user__logo', 'user__updated_at',
+)
 
+
+# HMAC-SHA256 keyed with INVOICE_TOKEN_SECRET (key pads computed once); .copy() per token
+_INVOICE_TOKEN_HMAC = hmac.new(INVOICE_TOKEN_SECRET.encode('utf-8'), digestmod=hashlib.sha256)
+_INVOICE_TOKEN_LENGTH = 32
+
+
+@lru_cache(maxsize=4096)
 def generate_invoice_token(order_id: int) -> str:
-    """Generate a secure token for public invoice access using HMAC."""
-    message = f"invoice-{order_id}".encode('utf-8')
-    token = hmac.new(
-        INVOICE_TOKEN_SECRET.encode('utf-8'),
-        message,
-        hashlib.sha256
-    ).hexdigest()[:32]  # Use first 32 chars for shorter URL
-    return token
+    """Generate a secure token for public invoice access using HMAC (deterministic per order)."""
+    h = _INVOICE_TOKEN_HMAC.copy()
+    h.update(f"invoice-{order_id}".encode('utf-8'))
+    return h.digest()[:_INVOICE_TOKEN_LENGTH // 2].hex()  # First 32 hex chars for shorter URL
 
 
 def verify_invoice_token(order_id: int, token: str) -> bool:
     """Verify that the token is valid for the given order_id."""
+    if len(token) != _INVOICE_TOKEN_LENGTH or not token.isascii():
+        return False
     expected_token = generate_invoice_token(order_id)
     return hmac.compare_digest(token, expected_token)
 
 
-def _get_order_payment_method(order) -> str:
-    """Derive payment method from order's transactions (Order model has no payment_method field)."""
-    txn = order.transactions.filter(status='success').first()
+def _get_order_payment_method(txn) -> str:
+    """Derive payment method from the order's first successful transaction (Order model has no payment_method field)."""
     if not txn:
         return "Pending"
     if getattr(txn, 'ug_order_id', None):
@@ -51,6 +67,55 @@ def _get_order_payment_method(order) -> str:
     return "Other"
 
 
+def _invoice_defaults(order):
+    """get_or_create() defaults for an order's invoice. The number is a callable, so the
+    timestamp is only formatted when the invoice is actually inserted."""
+    return {
+        'invoice_number': lambda: f'INV-{order.id}-{datetime.now().strftime("%Y%m%d%H%M%S")}',
+        'total_amount': order.total,
+    }
+
+
+def _public_invoice_etag(request, order, invoice, success_txns):
+    """
+    ETag for invoice_public_view, built from the updated_at of every row the response is
+    rendered from (invoice, order, vendor, items and their product/variant/unit, and the
+    successful transactions behind the payment method and transaction charge), plus the
+    request host, since the body holds absolute URLs.
+    """
+    parts = [request.get_host(), invoice.id, invoice.updated_at, order.updated_at, order.total, order.status]
+    parts.extend((t.id, t.updated_at) for t in success_txns)
+    if order.user:
+        parts.append(order.user.updated_at)
+    for item in order.items.all():
+        parts.extend((item.id, item.updated_at, item.product.updated_at, item.product_variant.updated_at))
+        if item.product_variant.unit:
+            parts.append(item.product_variant.unit.updated_at)
+    digest = hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=8).hexdigest()
+    return quote_etag(digest)
+
+
+def _accel_redirect_response(invoice, order_id):
+    """
+    Hand the stored PDF to nginx via X-Accel-Redirect when MEDIA_X_ACCEL_REDIRECT_PREFIX
+    is configured and the file is on local storage. Returns None to fall back to reading
+    the file in Django (not configured, remote storage, or missing/empty file).
+    """
+    prefix = getattr(settings, 'MEDIA_X_ACCEL_REDIRECT_PREFIX', '')
+    if not prefix or not isinstance(invoice.pdf_file.storage, FileSystemStorage):
+        return None
+    try:
+        # Same sanity check as the in-memory path: tiny files get regenerated there
+        if invoice.pdf_file.size < 100:
+            return None
+    except OSError:
+        return None
+    response = HttpResponse(content_type='application/pdf')
+    response['X-Accel-Redirect'] = f"{prefix.rstrip('/')}/{quote(invoice.pdf_file.name)}"
+    response['Content-Disposition'] = f'attachment; filename="invoice_order_{order_id}.pdf"'
+    return response
+
+
 @api_view(['POST', 'GET'])
 def invoice_generate(request, order_id):
     """
@@ -64,27 +129,22 @@ def invoice_generate(request, order_id):
         )
     
     try:
-        # Get order - superusers can access any order, regular users only their own
+        # Get order - superusers can access any order, regular users only their own.
+        # Items are not prefetched: generate_order_invoice loads them itself (one JOINed
+        # query) and only when the PDF actually has to be built.
         if request.user.is_superuser:
-            order = Order.objects.prefetch_related('items__product', 'items__product_variant__unit').get(id=order_id)
+            order = Order.objects.only(*INVOICE_ORDER_FIELDS).get(id=order_id)
         else:
-            order = Order.objects.prefetch_related('items__product', 'items__product_variant__unit').get(id=order_id, user=request.user)
+            order = Order.objects.only(*INVOICE_ORDER_FIELDS).get(id=order_id, user=request.user)
         
         # Check if invoice already exists
         invoice, created = Invoice.objects.get_or_create(
             order=order,
-            defaults={
-                'invoice_number': f'INV-{order.id}-{datetime.now().strftime("%Y%m%d%H%M%S")}',
-                'total_amount': order.total
-            }
+            defaults=_invoice_defaults(order)
         )
         
-        # Update total amount if order total changed
-        if invoice.total_amount != order.total:
-            invoice.total_amount = order.total
-            invoice.save()
-        
-        # If invoice exists but PDF is missing, regenerate it
+        # Write at most once: a (re)generated PDF carries the current total with it,
+        # otherwise only persist a changed total. Warm path (PDF present, total unchanged) writes nothing.
         if not invoice.pdf_file or not invoice.pdf_file.name:
             # Generate PDF
             pdf_file = generate_order_invoice(order)
@@ -93,10 +153,13 @@ def invoice_generate(request, order_id):
             invoice.pdf_file.save(
                 pdf_file.name,
                 pdf_file,
-                save=True
+                save=False
             )
             invoice.total_amount = order.total
-            invoice.save()
+            invoice.save(update_fields=['pdf_file', 'total_amount', 'updated_at'])
+        elif invoice.total_amount != order.total:
+            invoice.total_amount = order.total
+            invoice.save(update_fields=['total_amount', 'updated_at'])
         
         # Build download URL
         request_obj = request
@@ -143,8 +206,9 @@ def invoice_download(request, order_id):
         )
     
     try:
-        # Get order with items prefetched for PDF generation - superusers any order, others own only
-        order_qs = Order.objects.prefetch_related('items__product', 'items__product_variant__unit')
+        # Get order - superusers any order, others own only (items are loaded by
+        # generate_order_invoice only if the PDF has to be built)
+        order_qs = Order.objects.only(*INVOICE_ORDER_FIELDS)
         if request.user.is_superuser:
             order = order_qs.get(id=order_id)
         else:
@@ -156,17 +220,15 @@ def invoice_download(request, order_id):
         except Invoice.DoesNotExist:
             invoice, _ = Invoice.objects.get_or_create(
                 order=order,
-                defaults={
-                    'invoice_number': f'INV-{order.id}-{datetime.now().strftime("%Y%m%d%H%M%S")}',
-                    'total_amount': order.total
-                }
+                defaults=_invoice_defaults(order)
             )
         
-        # Staleness: if stored PDF exists but order total changed, clear and regenerate
+        # Staleness: if stored PDF exists but order total changed, clear and regenerate.
+        # No intermediate save: the regeneration below writes pdf_file and total_amount
+        # together, and if it fails the unchanged total_amount keeps the row marked stale.
         if invoice.pdf_file and invoice.pdf_file.name and invoice.total_amount != order.total:
             invoice.pdf_file.delete(save=False)
             invoice.pdf_file = None
-            invoice.save()
         
         # Generate PDF if missing (or was just invalidated)
         if not invoice.pdf_file or not invoice.pdf_file.name:
@@ -174,34 +236,39 @@ def invoice_download(request, order_id):
             invoice.pdf_file.save(
                 pdf_file.name,
                 pdf_file,
-                save=True
+                save=False
             )
             invoice.total_amount = order.total
-            invoice.save()
+            invoice.save(update_fields=['pdf_file', 'total_amount', 'updated_at'])
+        
+        # Let nginx stream the file when configured (frees this worker for the transfer)
+        response = _accel_redirect_response(invoice, order.id)
+        if response is not None:
+            return response
         
-        # Return PDF from memory so response is independent of storage/file handle lifecycle
+        # Stream the PDF from storage instead of reading it into memory;
+        # FileResponse closes the file handle once the response has been sent
         try:
-            with invoice.pdf_file.open('rb') as f:
-                pdf_bytes = f.read()
             # If stored PDF is empty or invalid, regenerate once
-            if len(pdf_bytes) < 100:
+            if invoice.pdf_file.size < 100:
                 invoice.pdf_file.delete(save=False)
                 invoice.pdf_file = None
-                invoice.save()
+                invoice.save(update_fields=['pdf_file', 'updated_at'])
                 pdf_file = generate_order_invoice(order)
-                invoice.pdf_file.save(pdf_file.name, pdf_file, save=True)
+                invoice.pdf_file.save(pdf_file.name, pdf_file, save=False)
                 invoice.total_amount = order.total
-                invoice.save()
-                with invoice.pdf_file.open('rb') as f:
-                    pdf_bytes = f.read()
-                if len(pdf_bytes) < 100:
+                invoice.save(update_fields=['pdf_file', 'total_amount', 'updated_at'])
+                if invoice.pdf_file.size < 100:
                     return Response(
                         {'error': 'Failed to generate invoice PDF'},
                         status=status.HTTP_500_INTERNAL_SERVER_ERROR
                     )
-            response = HttpResponse(pdf_bytes, content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="invoice_order_{order.id}.pdf"'
-            return response
+            return FileResponse(
+                invoice.pdf_file.open('rb'),
+                as_attachment=True,
+                filename=f'invoice_order_{order.id}.pdf',
+                content_type='application/pdf'
+            )
         except Exception as e:
             return Response(
                 {'error': f'Failed to read PDF file: {str(e)}'},
@@ -284,41 +351,50 @@ def invoice_public_view(request, order_id, token):
         )
     
     try:
-        # Get order with related data (prefetch transactions for payment_method derivation)
-        order = Order.objects.prefetch_related(
-            'items__product',
-            'items__product_variant__unit',
-            'user',
-            'transactions',
+        # Get order with vendor joined and items (with product/variant/unit) in one prefetch
+        order = Order.objects.select_related('user').only(*PUBLIC_INVOICE_ORDER_FIELDS).prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product', 'product_variant__unit'))
         ).get(id=order_id)
         
         # Get or create invoice
         invoice, created = Invoice.objects.get_or_create(
             order=order,
-            defaults={
-                'invoice_number': f'INV-{order.id}-{datetime.now().strftime("%Y%m%d%H%M%S")}',
-                'total_amount': order.total
-            }
+            defaults=_invoice_defaults(order)
         )
         
-        # Generate PDF if missing
-        if not invoice.pdf_file or not invoice.pdf_file.name:
-            pdf_file = generate_order_invoice(order)
+        # One query over the order's successful transactions (pk order) gives both the
+        # payment method (first one) and the transaction charge (sum of transaction_fee)
+        success_txns = list(
+            order.transactions.filter(status='success')
+            .only('id', 'order', 'amount', 'transaction_category', 'vpa', 'ug_order_id', 'updated_at')
+            .order_by('pk')
+        )
+        
+        # Repeat loads of an unchanged invoice: answer 304 before PDF generation
+        # and the JSON build
+        has_pdf = bool(invoice.pdf_file and invoice.pdf_file.name)
+        if has_pdf:
+            etag = _public_invoice_etag(request, order, invoice, success_txns)
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                not_modified['ETag'] = etag
+                patch_vary_headers(not_modified, ('Host',))
+                return not_modified
+        
+        # Generate PDF if missing (reusing the prefetched items)
+        if not has_pdf:
+            pdf_file = generate_order_invoice(order, items=order.items.all())
             invoice.pdf_file.save(
                 pdf_file.name,
                 pdf_file,
-                save=True
+                save=False
             )
             invoice.total_amount = order.total
-            invoice.save()
+            invoice.save(update_fields=['pdf_file', 'total_amount', 'updated_at'])
+            etag = _public_invoice_etag(request, order, invoice, success_txns)
         
-        # Order-level transaction charge (sum of transaction_fee for this order)
-        txn_charge_agg = order.transactions.filter(
-            transaction_category='transaction_fee',
-            status='success',
-        ).aggregate(Sum('amount'))
-        transaction_charge = txn_charge_agg['amount__sum']
-        transaction_charge_str = str(transaction_charge) if transaction_charge is not None else None
+        fee_amounts = [t.amount for t in success_txns if t.transaction_category == 'transaction_fee']
+        transaction_charge_str = str(sum(fee_amounts)) if fee_amounts else None
 
         # Build items list
         items = []
@@ -378,7 +454,7 @@ def invoice_public_view(request, order_id, token):
             'order': {
                 'id': order.id,
                 'status': order.status,
-                'payment_method': _get_order_payment_method(order),
+                'payment_method': _get_order_payment_method(success_txns[0] if success_txns else None),
                 'total': str(order.total),
                 'remarks': '',
                 'customer_name': order.name,
@@ -392,7 +468,12 @@ def invoice_public_view(request, order_id, token):
             'pdf_url': request.build_absolute_uri(invoice.pdf_file.url) if invoice.pdf_file else None,
         }
         
-        return Response(response_data, status=status.HTTP_200_OK)
+        response = Response(response_data, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Host',))
+        # Browsers revalidate with If-None-Match on every load instead of reusing a stale copy
+        patch_cache_control(response, no_cache=True)
+        return response
         
     except Order.DoesNotExist:
         return Response(
@@ -431,7 +512,7 @@ def invoice_public_download(request, order_id, token):
                         {'error': 'Request body is required'},
                         status=status.HTTP_400_BAD_REQUEST
                     )
-                payload = json.loads(body.decode('utf-8'))
+                payload = json_loads(body)
             except (ValueError, UnicodeDecodeError) as e:
                 return Response(
                     {'error': f'Invalid JSON: {str(e)}'},
@@ -467,26 +548,21 @@ def invoice_public_download(request, order_id, token):
 
     # GET: legacy – generate from DB
     try:
-        # Get order
-        order = Order.objects.prefetch_related(
-            'items__product', 
-            'items__product_variant__unit'
-        ).get(id=order_id)
+        # Get order (items are loaded by generate_order_invoice if the PDF has to be built)
+        order = Order.objects.only(*INVOICE_ORDER_FIELDS).get(id=order_id)
         
         # Get or create invoice
         invoice, created = Invoice.objects.get_or_create(
             order=order,
-            defaults={
-                'invoice_number': f'INV-{order.id}-{datetime.now().strftime("%Y%m%d%H%M%S")}',
-                'total_amount': order.total
-            }
+            defaults=_invoice_defaults(order)
         )
         
-        # Staleness: if stored PDF exists but order total changed, clear and regenerate
+        # Staleness: if stored PDF exists but order total changed, clear and regenerate.
+        # No intermediate save: the regeneration below writes pdf_file and total_amount
+        # together, and if it fails the unchanged total_amount keeps the row marked stale.
         if invoice.pdf_file and invoice.pdf_file.name and invoice.total_amount != order.total:
             invoice.pdf_file.delete(save=False)
             invoice.pdf_file = None
-            invoice.save()
         
         # Generate PDF if missing (or was just invalidated)
         if not invoice.pdf_file or not invoice.pdf_file.name:
@@ -494,34 +570,39 @@ def invoice_public_download(request, order_id, token):
             invoice.pdf_file.save(
                 pdf_file.name,
                 pdf_file,
-                save=True
+                save=False
             )
             invoice.total_amount = order.total
-            invoice.save()
+            invoice.save(update_fields=['pdf_file', 'total_amount', 'updated_at'])
         
-        # Return PDF from memory so response is independent of storage/file handle lifecycle
+        # Let nginx stream the file when configured (frees this worker for the transfer)
+        response = _accel_redirect_response(invoice, order.id)
+        if response is not None:
+            return response
+        
+        # Stream the PDF from storage instead of reading it into memory;
+        # FileResponse closes the file handle once the response has been sent
         try:
-            with invoice.pdf_file.open('rb') as f:
-                pdf_bytes = f.read()
             # If stored PDF is empty or invalid, regenerate once
-            if len(pdf_bytes) < 100:
+            if invoice.pdf_file.size < 100:
                 invoice.pdf_file.delete(save=False)
                 invoice.pdf_file = None
-                invoice.save()
+                invoice.save(update_fields=['pdf_file', 'updated_at'])
                 pdf_file = generate_order_invoice(order)
-                invoice.pdf_file.save(pdf_file.name, pdf_file, save=True)
+                invoice.pdf_file.save(pdf_file.name, pdf_file, save=False)
                 invoice.total_amount = order.total
-                invoice.save()
-                with invoice.pdf_file.open('rb') as f:
-                    pdf_bytes = f.read()
-                if len(pdf_bytes) < 100:
+                invoice.save(update_fields=['pdf_file', 'total_amount', 'updated_at'])
+                if invoice.pdf_file.size < 100:
                     return Response(
                         {'error': 'Failed to generate invoice PDF'},
                         status=status.HTTP_500_INTERNAL_SERVER_ERROR
                     )
-            response = HttpResponse(pdf_bytes, content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="invoice_order_{order.id}.pdf"'
-            return response
+            return FileResponse(
+                invoice.pdf_file.open('rb'),
+                as_attachment=True,
+                filename=f'invoice_order_{order.id}.pdf',
+                content_type='application/pdf'
+            )
         except Exception as e:
             return Response(
                 {'error': f'Failed to read PDF file: {str(e)}'},
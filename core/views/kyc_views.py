@@ -6,6 +6,7 @@ from django.core.files.base import ContentFile
 import json
 import os
 from django.core.paginator import Paginator
+from django.db.models import Q
 from ..models import User
 from ..serializers import UserSerializer, KYCSerializer
 
@@ -236,9 +237,7 @@ def kyc_pending(request):
         # Apply search filter
         if search:
             queryset = queryset.filter(
-                name__icontains=search
-            ) | queryset.filter(
-                phone__icontains=search
+                Q(name__icontains=search) | Q(phone__icontains=search)
             )
         
         # Order by created_at
@@ -338,9 +337,7 @@ def kyc_list(request):
         # Apply search filter
         if search:
             queryset = queryset.filter(
-                name__icontains=search
-            ) | queryset.filter(
-                phone__icontains=search
+                Q(name__icontains=search) | Q(phone__icontains=search)
             )
         
         # Order by created_at
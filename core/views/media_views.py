@@ -0,0 +1,43 @@
+"""
+Serving of uploaded media (/media/...) files
+"""
+import mimetypes
+import os
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.views.static import serve
+
+# Resolved once; every request's path is checked against it
+_MEDIA_ROOT = os.path.normpath(settings.MEDIA_ROOT)
+_MEDIA_ROOT_PREFIX = _MEDIA_ROOT + os.sep
+
+# Read size for files streamed by Django (FileResponse defaults to 4 KB)
+MEDIA_BLOCK_SIZE = 64 * 1024
+
+
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT.
+    With MEDIA_X_ACCEL_REDIRECT_PREFIX set, only headers are returned and nginx sends the
+    file from its internal location; otherwise the file is streamed by django.views.static.serve.
+    """
+    prefix = getattr(settings, 'MEDIA_X_ACCEL_REDIRECT_PREFIX', '')
+    if not prefix:
+        response = serve(request, path, document_root=_MEDIA_ROOT)
+        if isinstance(response, FileResponse):
+            # Larger reads: fewer Python iterations / syscalls per file (also used by wsgi.file_wrapper)
+            response.block_size = MEDIA_BLOCK_SIZE
+        return response
+
+    full_path = os.path.normpath(os.path.join(_MEDIA_ROOT, path))
+    if not full_path.startswith(_MEDIA_ROOT_PREFIX) or not os.path.isfile(full_path):
+        raise Http404('File not found')
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    response = HttpResponse(content_type=content_type or 'application/octet-stream')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    relative_path = os.path.relpath(full_path, _MEDIA_ROOT).replace(os.sep, '/')
+    response['X-Accel-Redirect'] = f"{prefix.rstrip('/')}/{quote(relative_path)}"
+    return response
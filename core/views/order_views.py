@@ -11,7 +11,7 @@ from ..models import Order, OrderItem, Product, ProductVariant, User, Invoice, S
 from ..serializers import OrderSerializer, OrderItemSerializer
 from ..services.fcm_service import send_fcm_notification, send_incoming_order_to_vendor, send_dismiss_incoming_to_vendor
 from ..services.pdf_service import generate_order_invoice
-from ..services.whatsapp_service import send_order_bill_whatsapp, send_order_ready_whatsapp
+from ..services.whatsapp_service import send_order_bill_whatsapp_async, send_order_ready_whatsapp_async
 from ..utils.order_action_token import verify_order_action_token
 from ..utils.date_helpers import parse_date_range
 # NOTE: process_order_transactions is now called in payment_views.py on payment success
@@ -436,15 +436,15 @@ def order_edit(request, id):
                 # Build absolute URL for the PDF
                 pdf_url = request.build_absolute_uri(invoice.pdf_file.url)
                 
-                # Send WhatsApp notification
-                send_order_bill_whatsapp(order, pdf_url)
+                # Send WhatsApp notification in background
+                send_order_bill_whatsapp_async(order.id, pdf_url)
             except Exception as e:
                 logger.error(f'Failed to send WhatsApp bill for order {order.id}: {str(e)}')
 
         # Send WhatsApp "order ready" (mycafeready template) to customer when status changes to ready
         if status_val == 'ready' and status_val != old_status:
             try:
-                send_order_ready_whatsapp(order)
+                send_order_ready_whatsapp_async(order.id)
             except Exception as e:
                 logger.error(f'Failed to send order-ready WhatsApp for order {order.id}: {str(e)}')
 
@@ -676,7 +676,7 @@ def order_status_from_notification(request, id):
                     pdf_file = generate_order_invoice(order)
                     invoice.pdf_file.save(pdf_file.name, pdf_file, save=True)
                 pdf_url = request.build_absolute_uri(invoice.pdf_file.url)
-                send_order_bill_whatsapp(order, pdf_url)
+                send_order_bill_whatsapp_async(order.id, pdf_url)
             except Exception as e:
                 logger.error(f'Failed to send WhatsApp bill for order {order.id}: {str(e)}')
 
@@ -818,8 +818,8 @@ def verify_payment(request, client_txn_id):
             elif payment_type == PAYMENT_TYPE_DUES or payment_type == 'due_paid':
                 # Process due payment (update due balance)
                 from ..utils.transaction_helpers import update_user_due_balance, update_system_balance
-                update_user_due_balance(transaction.user, int(transaction.amount), 'subtract')
-                update_system_balance(int(transaction.amount), 'add')
+                update_user_due_balance(transaction.user, int(transaction.amount), 'subtract', refresh=False)
+                update_system_balance(int(transaction.amount), 'add', return_balance=False)
                 logger.info(f"Due payment processed for user {transaction.user.id}")
             
             elif payment_type == PAYMENT_TYPE_SUBSCRIPTION:
@@ -840,10 +840,12 @@ def verify_payment(request, client_txn_id):
                         user.subscription_start_date = date_type.today()
                         user.subscription_end_date = date_type.today() + relativedelta(months=months)
                     
-                    user.save()
+                    # Only the subscription dates: a full save would write back this instance's
+                    # possibly stale balance/due_balance over concurrent F() updates
+                    user.save(update_fields=['subscription_start_date', 'subscription_end_date', 'updated_at'])
                     
                 from ..utils.transaction_helpers import update_system_balance
-                update_system_balance(int(transaction.amount), 'add')
+                update_system_balance(int(transaction.amount), 'add', return_balance=False)
                 logger.info(f"Subscription processed for user {transaction.user.id}")
             
             elif payment_type == PAYMENT_TYPE_QR_STAND and transaction.qr_stand_order:
@@ -853,7 +855,7 @@ def verify_payment(request, client_txn_id):
                 transaction.qr_stand_order.save()
                 
                 from ..utils.transaction_helpers import update_system_balance
-                update_system_balance(int(transaction.amount), 'add')
+                update_system_balance(int(transaction.amount), 'add', return_balance=False)
                 logger.info(f"QR Stand Order #{transaction.qr_stand_order.id} marked as paid, system balance updated")
             else:
                 # Log when no matching payment type handler was found
@@ -1094,7 +1096,7 @@ def payment_callback(request):
                     transaction.qr_stand_order.save()
                     
                     from ..utils.transaction_helpers import update_system_balance
-                    update_system_balance(int(transaction.amount), 'add')
+                    update_system_balance(int(transaction.amount), 'add', return_balance=False)
                     logger.info(f"[Callback] QR Stand Order #{transaction.qr_stand_order.id} marked as paid, system balance updated")
                 elif payment_type == PAYMENT_TYPE_QR_STAND and not transaction.qr_stand_order:
                     logger.error(f"[Callback] payment_type is 'qr_stand' but transaction.qr_stand_order is None for {txn_id}")
@@ -1102,8 +1104,8 @@ def payment_callback(request):
                 # Handle dues and subscription
                 if payment_type == PAYMENT_TYPE_DUES or payment_type == 'due_paid':
                     from ..utils.transaction_helpers import update_user_due_balance, update_system_balance
-                    update_user_due_balance(transaction.user, int(transaction.amount), 'subtract')
-                    update_system_balance(int(transaction.amount), 'add')
+                    update_user_due_balance(transaction.user, int(transaction.amount), 'subtract', refresh=False)
+                    update_system_balance(int(transaction.amount), 'add', return_balance=False)
                 
                 elif payment_type == PAYMENT_TYPE_SUBSCRIPTION:
                     from dateutil.relativedelta import relativedelta
@@ -1122,10 +1124,12 @@ def payment_callback(request):
                             user.subscription_start_date = date_type.today()
                             user.subscription_end_date = date_type.today() + relativedelta(months=months)
                         
-                        user.save()
+                        # Only the subscription dates: a full save would write back this instance's
+                        # possibly stale balance/due_balance over concurrent F() updates
+                        user.save(update_fields=['subscription_start_date', 'subscription_end_date', 'updated_at'])
                     
                     from ..utils.transaction_helpers import update_system_balance
-                    update_system_balance(int(transaction.amount), 'add')
+                    update_system_balance(int(transaction.amount), 'add', return_balance=False)
             
             elif result['status'] == 'failure':
                 transaction.status = 'failed'
@@ -1,7 +1,7 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Count, Sum, Q, Avg, Max, Min
+from django.db.models import Count, Sum, Q, Avg, Max, Min, OuterRef, Subquery
 from django.utils import timezone
 from decimal import Decimal
 from datetime import datetime, timedelta
@@ -9,7 +9,7 @@ from ..models import (
     Product, Order, Category, TransactionHistory, OrderItem, User,
     SuperSetting, ShareholderWithdrawal,
 )
-from ..utils.subscription_helpers import get_effective_subscription_end_date
+from ..utils.subscription_helpers import annotate_subscription_state
 from ..utils.date_helpers import parse_date_range
 
 
@@ -586,13 +586,19 @@ def vendor_report(request):
             .annotate(count=Count('id'))
             .order_by('created_date')
         )
+        # Per-vendor order stats as correlated subqueries: one query for the whole list,
+        # and no join against orders that the subscription annotations would fan out over
+        vendor_orders = Order.objects.filter(user=OuterRef('pk')).order_by().values('user')
         vendors_list = []
-        for v in vendors_qs.order_by('-id')[:200]:
-            last_order = Order.objects.filter(user=v).order_by('-created_at').first()
-            total_orders = Order.objects.filter(user=v).count()
-            rev = Order.objects.filter(user=v).aggregate(t=Sum('total'))['t'] or Decimal('0')
+        vendors_rows = annotate_subscription_state(vendors_qs, today).annotate(
+            last_order_at=Subquery(vendor_orders.annotate(m=Max('created_at')).values('m')[:1]),
+            order_count=Subquery(vendor_orders.annotate(c=Count('id')).values('c')[:1]),
+            order_revenue=Subquery(vendor_orders.annotate(t=Sum('total')).values('t')[:1]),
+        ).order_by('-id')[:200]
+        for v in vendors_rows:
+            rev = v.order_revenue or Decimal('0')
             logo_url = request.build_absolute_uri(v.logo.url) if v.logo else None
-            effective_end = get_effective_subscription_end_date(v)
+            effective_end = v.effective_end_date
             vendors_list.append({
                 'id': v.id,
                 'name': v.name,
@@ -601,11 +607,12 @@ def vendor_report(request):
                 'logo_url': logo_url,
                 'kyc_status': v.kyc_status,
                 'subscription_end_date': effective_end.isoformat() if effective_end else None,
+                'subscription_state': v.subscription_state,
                 'due_balance': v.due_balance,
                 'is_over_threshold': v.due_balance >= due_threshold,
-                'total_orders': total_orders,
+                'total_orders': v.order_count or 0,
                 'total_revenue': str(rev),
-                'last_order_date': last_order.created_at.date().isoformat() if last_order else None,
+                'last_order_date': v.last_order_at.date().isoformat() if v.last_order_at else None,
                 'is_active': v.is_active,
                 'created_at': v.created_at.isoformat() if v.created_at else None,
             })
@@ -90,7 +90,7 @@ def whatsapp_notification_detail(request, id):
 def _run_send_marketing(notification_id):
     """Background thread: load notification and run send_marketing_whatsapp."""
     try:
-        notification = WhatsAppNotification.objects.filter(pk=notification_id).select_related('user').prefetch_related('customers').first()
+        notification = WhatsAppNotification.objects.filter(pk=notification_id).select_related('user').first()
         if notification:
             send_marketing_whatsapp(notification)
     except Exception as e:
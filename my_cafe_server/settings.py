@@ -175,6 +175,14 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Internal nginx location aliased to MEDIA_ROOT (e.g. '/protected_media/'). When set, file
+# downloads are handed to nginx via X-Accel-Redirect instead of being read by Django.
+MEDIA_X_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_X_ACCEL_REDIRECT_PREFIX', '')
+
+# Log the hashing backend and an HMAC throughput sample at startup (core.utils.crypto_selftest).
+# Off by default so manage.py commands and test runs don't pay for it; set CRYPTO_SELFTEST=1
+# on a web worker to check a deployment.
+CRYPTO_SELFTEST = os.environ.get('CRYPTO_SELFTEST', '').lower() in ('1', 'true', 'yes')
 
 
 # Default primary key field type
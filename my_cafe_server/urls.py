@@ -14,8 +14,10 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -66,6 +68,7 @@ from core.views.payment_views import (
 from core.views.vendor_customer_views import vendor_customer_list, vendor_customer_create, vendor_customer_detail, vendor_customer_edit, vendor_customer_delete
 from core.views.whatsapp_notification_views import whatsapp_notification_list, whatsapp_notification_detail, whatsapp_notification_create
 from core.views.upload_views import upload_file
+from core.views.media_views import serve_media
 
 urlpatterns = [
     
@@ -248,7 +251,11 @@ urlpatterns = [
     path('api/whatsapp-notifications/<int:id>/', whatsapp_notification_detail, name='whatsapp_notification_detail'),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Media through serve_media: nginx X-Accel-Redirect when configured, static serve otherwise (DEBUG)
+if settings.DEBUG or settings.MEDIA_X_ACCEL_REDIRECT_PREFIX:
+    urlpatterns.append(
+        re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media)
+    )
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 
 urlpatterns.append(